@@ -0,0 +1,400 @@
+import collections
+import socket
+import ssl
+import struct
+import threading
+from typing import Any, Dict
+
+import paho.mqtt.client as mqtt
+
+from util import get_time
+
+PUBLISH = mqtt.PUBLISH
+PUBREL = mqtt.PUBREL
+# offset of tcpi_bytes_acked, followed by tcpi_bytes_received, in Linux's struct tcp_info
+TCP_INFO_BYTES_OFFSET = 120
+
+
+def read_varint(buf, pos):
+    """Decodes an MQTT variable byte integer. Returns (value, position after it)."""
+    value = 0
+    mult = 1
+    while True:
+        byte = buf[pos]
+        pos += 1
+        value += (byte & 0x7F) * mult
+        if not byte & 0x80:
+            return value, pos
+        mult *= 128
+
+
+def publish_payload_len(packet, qos, mqttv5=True) -> int:
+    """Returns the payload length of a serialised PUBLISH packet"""
+    remaining_length, pos = read_varint(packet, 1)
+    end = pos + remaining_length
+    (topic_len,) = struct.unpack_from("!H", packet, pos)
+    pos += 2 + topic_len
+    if qos > 0:
+        pos += 2
+    if mqttv5:
+        props_len, pos = read_varint(packet, pos)
+        pos += props_len
+    return end - pos
+
+
+def ws_header_len(length, masked) -> int:
+    """Returns the size of the WebSocket frame header for a frame with length bytes of payload"""
+    header_len = 2 if length < 126 else 4 if length < 65536 else 10
+    return header_len + (4 if masked else 0)
+
+
+def tcp_bytes(sock):
+    """Returns (bytes sent, bytes received) by the TCP connection under sock, including any
+    TLS records and WebSocket frames, or None if TCP_INFO is not available (ie. not on Linux)"""
+    if not hasattr(socket, "TCP_INFO"):
+        return None
+    # WebsocketWrapper keeps the underlying socket in _socket
+    sock = getattr(sock, "_socket", sock)
+    try:
+        info = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_INFO, 256)
+    except (OSError, AttributeError):
+        return None
+    if len(info) < TCP_INFO_BYTES_OFFSET + 16:
+        return None
+    acked, received = struct.unpack_from("=QQ", info, TCP_INFO_BYTES_OFFSET)
+    # the SYN is counted as an acked byte
+    return max(acked - 1, 0), received
+
+
+class ResumingSSLSocket(ssl.SSLSocket):
+    """SSLSocket that offers the last session of its ResumableSSLContext in the handshake
+    and times the handshake"""
+
+    def do_handshake(self, *args, **kwargs):
+        context = self.context
+        if context.resume and context.session is not None:
+            self.session = context.session
+        context.handshake_start = get_time()
+        super().do_handshake(*args, **kwargs)
+        context.handshake_done = get_time()
+        context.session_reused = self.session_reused
+        context.session = self.session
+
+    def close(self):
+        # TLS 1.3 session tickets arrive after the handshake, so save the session again before closing
+        if self._sslobj is not None and self.session is not None:
+            self.context.session = self.session
+        super().close()
+
+
+class ResumableSSLContext(ssl.SSLContext):
+    """SSLContext that is reused across reconnects, so that reconnects can resume the previous TLS session
+    instead of paying for a full handshake. Resumption can be turned off to measure full handshakes
+    with the same timing."""
+
+    sslsocket_class = ResumingSSLSocket
+
+    def __new__(cls, resume=True, ca_certs=""):
+        return super().__new__(cls, ssl.PROTOCOL_TLS_CLIENT)
+
+    def __init__(self, resume=True, ca_certs=""):
+        super().__init__()
+        self.resume = resume
+        self.session = None
+        self.session_reused = False
+        self.handshake_start = -1
+        self.handshake_done = -1
+        if ca_certs:
+            self.load_verify_locations(ca_certs)
+        else:
+            self.load_default_certs()
+
+
+class PacketQueue(collections.deque):
+    """paho's deque of outgoing packets, which also remembers the PUBLISH and PUBREL packets appended
+    to it until take_written() hands them out once paho has written them in full"""
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._tracked = []
+        self._lock = threading.Lock()
+
+    def append(self, packet):
+        # paho only appends in _packet_queue(), requeued packets go back with appendleft()
+        if (packet["command"] & 0xF0) in (PUBLISH, PUBREL):
+            with self._lock:
+                self._tracked.append(packet)
+        super().append(packet)
+
+    def take_written(self) -> list:
+        with self._lock:
+            written = [pkt for pkt in self._tracked if pkt["to_process"] == 0]
+            self._tracked = [pkt for pkt in self._tracked if pkt["to_process"] > 0]
+        return written
+
+
+class InstrumentedClient(mqtt.Client):
+    """paho Client that timestamps the control packets of every outgoing message.
+    paho 1.6.1 has no public hooks below on_publish, so this overrides publish(), its packet queue/write
+    and PUBACK/PUBREC/PUBCOMP handlers, and always defers to the original implementation."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # mid -> {"publish_called": t, "publish_written": t, "pubrec": t, ...} in ms
+        self.stage_times: Dict[int, Dict[str, float]] = {}
+        self._stage_lock = threading.Lock()
+        # timestamps of the phases of the latest connection attempt in ms
+        self.connect_phases: Dict[str, Any] = {}
+        # bytes sent/received at each layer, see calc_wire_stats()
+        self.byte_counts: Dict[str, int] = dict.fromkeys(
+            [
+                "payload_sent",
+                "payload_recv",
+                "mqtt_sent",
+                "mqtt_recv",
+                "control_sent",
+                "control_recv",
+                "ws_framing_sent",
+                "ws_framing_recv",
+                "wire_sent",
+                "wire_recv",
+            ],
+            0,
+        )
+        self.wire_available = True
+        self._payload_lens: Dict[int, int] = {}
+
+    @property
+    def _out_packet(self):
+        return self._packet_deque
+
+    @_out_packet.setter
+    def _out_packet(self, packets):
+        # paho assigns a new deque in __init__() and on every reconnect
+        self._packet_deque = PacketQueue(packets)
+
+    def _create_socket_connection(self):
+        self.connect_phases = {"tcp_start": get_time()}
+        sock = super()._create_socket_connection()
+        self.connect_phases["tcp_done"] = get_time()
+        return sock
+
+    def _send_connect(self, keepalive):
+        # the TLS handshake and WebSocket upgrade have completed by the time CONNECT is sent
+        if self._ssl and isinstance(self._ssl_context, ResumableSSLContext):
+            self.connect_phases["tls_start"] = self._ssl_context.handshake_start
+            self.connect_phases["tls_done"] = self._ssl_context.handshake_done
+            self.connect_phases["tls_resumed"] = self._ssl_context.session_reused
+        if self._transport == "websockets":
+            self.connect_phases["ws_start"] = self.connect_phases.get(
+                "tls_done", self.connect_phases.get("tcp_done", -1)
+            )
+            self.connect_phases["ws_done"] = get_time()
+        self.connect_phases["connect_sent"] = get_time()
+        return super()._send_connect(keepalive)
+
+    def _handle_connack(self):
+        self.connect_phases["connack"] = get_time()
+        return super()._handle_connack()
+
+    def _sock_send(self, buf):
+        length = super()._sock_send(buf)
+        self.byte_counts["mqtt_sent"] += length
+        if self._transport == "websockets" and length > 0:
+            # WebsocketWrapper sends each call as one masked frame and returns the payload length
+            self.byte_counts["ws_framing_sent"] += ws_header_len(length, True)
+        return length
+
+    def _sock_recv(self, bufsize):
+        data = super()._sock_recv(bufsize)
+        self.byte_counts["mqtt_recv"] += len(data)
+        return data
+
+    def _sock_close(self):
+        if self._sock is not None:
+            wire = tcp_bytes(self._sock)
+            if wire is None:
+                self.wire_available = False
+            else:
+                self.byte_counts["wire_sent"] += wire[0]
+                self.byte_counts["wire_recv"] += wire[1]
+        return super()._sock_close()
+
+    def _packet_handle(self):
+        packet_len = self._in_packet["remaining_length"] + 1 + len(self._in_packet["remaining_count"])
+        if (self._in_packet["command"] & 0xF0) != PUBLISH:
+            self.byte_counts["control_recv"] += packet_len
+        if self._transport == "websockets":
+            # estimate, assumes that the broker sends each MQTT packet in its own unmasked frame
+            self.byte_counts["ws_framing_recv"] += ws_header_len(packet_len, False)
+        return super()._packet_handle()
+
+    def _handle_on_message(self, message):
+        self.byte_counts["payload_recv"] += len(message.payload)
+        return super()._handle_on_message(message)
+
+    def byte_totals(self) -> Dict[str, int]:
+        """byte_counts including the bytes of the current connection"""
+        totals = dict(self.byte_counts)
+        if self._sock is not None:
+            wire = tcp_bytes(self._sock)
+            if wire is not None:
+                totals["wire_sent"] += wire[0]
+                totals["wire_recv"] += wire[1]
+        if not self.wire_available or not hasattr(socket, "TCP_INFO"):
+            totals["wire_sent"] = totals["wire_recv"] = -1
+        return totals
+
+    def strip_topic_aliases(self, topics: Dict[int, str], properties):
+        """Topic aliases only last for one connection, so this gives the QoS 1/2 messages that paho
+        resends on the next connection their full topic back and replaces their properties.
+        topics maps the aliases of the last connection to their topics."""
+        with self._out_message_mutex:
+            for message in self._out_messages.values():
+                alias = getattr(message.properties, "TopicAlias", 0)
+                if alias:
+                    if not message.topic:
+                        message._topic = topics[alias].encode("utf-8")
+                    message.properties = properties
+
+    def _record_stage(self, mid: int, stage: str):
+        with self._stage_lock:
+            self.stage_times.setdefault(mid, {})[stage] = get_time()
+
+    def publish(self, topic, payload=None, qos=0, retain=False, properties=None):
+        # QoS 1/2 messages beyond max_inflight only reach _packet_queue() once earlier ones are acked,
+        # so the time spent in paho's queue starts here
+        called = get_time()
+        info = super().publish(topic, payload, qos, retain, properties)
+        with self._stage_lock:
+            # the PUBLISH may already have been written before publish() returns, timestamps
+            # from before the call belong to an earlier message with the same mid
+            times = self.stage_times.get(info.mid, {})
+            self.stage_times[info.mid] = {
+                "publish_called": called,
+                **{stage: t for stage, t in times.items() if t >= called},
+            }
+        return info
+
+    def _packet_queue(self, command, packet, mid, qos, info=None):
+        if (command & 0xF0) == PUBLISH:
+            self._payload_lens[mid] = publish_payload_len(
+                packet, qos, self._protocol == mqtt.MQTTv5
+            )
+        else:
+            # CONNECT, SUBSCRIBE, PUBACK/PUBREC/PUBREL/PUBCOMP, PINGREQ, DISCONNECT, ...
+            self.byte_counts["control_sent"] += len(packet)
+        return super()._packet_queue(command, packet, mid, qos, info)
+
+    def _packet_write(self):
+        rc = super()._packet_write()
+        # paho writes until its deque is empty, this includes packets that publish() queued from
+        # another thread while it was writing
+        for pkt in self._out_packet.take_written():
+            if (pkt["command"] & 0xF0) == PUBLISH:
+                self._record_stage(pkt["mid"], "publish_written")
+                self.byte_counts["payload_sent"] += self._payload_lens.get(pkt["mid"], 0)
+            else:
+                self._record_stage(pkt["mid"], "pubrel_written")
+        return rc
+
+    def _in_packet_mid(self) -> int:
+        (mid,) = struct.unpack("!H", self._in_packet["packet"][:2])
+        return mid
+
+    def _handle_pubrec(self):
+        if self._in_packet["remaining_length"] >= 2:
+            self._record_stage(self._in_packet_mid(), "pubrec")
+        return super()._handle_pubrec()
+
+    def _handle_pubackcomp(self, cmd):
+        if self._in_packet["remaining_length"] >= 2:
+            self._record_stage(self._in_packet_mid(), cmd.lower())
+        return super()._handle_pubackcomp(cmd)
+
+
+def calc_stage_durations(times: Dict[str, float]) -> Dict[str, Any]:
+    """Converts the control packet timestamps of one message into per-stage durations in ms:
+    queue_time: publish() called until the PUBLISH was written to the socket, including the time
+        spent in paho's queue of messages waiting for a free max_inflight slot
+    puback_time (QoS 1): PUBLISH written until PUBACK received
+    pubrec_time (QoS 2): PUBLISH written until PUBREC received
+    pubrel_time (QoS 2): PUBREC received until PUBREL written
+    pubcomp_time (QoS 2): PUBREL written until PUBCOMP received"""
+    stages = {
+        "queue_time": ("publish_called", "publish_written"),
+        "puback_time": ("publish_written", "puback"),
+        "pubrec_time": ("publish_written", "pubrec"),
+        "pubrel_time": ("pubrec", "pubrel_written"),
+        "pubcomp_time": ("pubrel_written", "pubcomp"),
+    }
+    return {
+        stage: times[end] - times[start]
+        for stage, (start, end) in stages.items()
+        if start in times and end in times
+    }
+
+
+def calc_connect_durations(phases: Dict[str, Any]) -> Dict[str, Any]:
+    """Converts the timestamps of one connection attempt into per-phase durations in ms:
+    tcp_time: TCP connect
+    tls_time: TLS handshake, with tls_resumed set if the previous session was resumed
+    ws_time: WebSocket upgrade
+    mqtt_time: CONNECT sent until CONNACK received"""
+    phase_names = {
+        "tcp_time": ("tcp_start", "tcp_done"),
+        "tls_time": ("tls_start", "tls_done"),
+        "ws_time": ("ws_start", "ws_done"),
+        "mqtt_time": ("connect_sent", "connack"),
+    }
+    durations = {
+        phase: phases[end] - phases[start]
+        for phase, (start, end) in phase_names.items()
+        if start in phases and end in phases
+    }
+    if "tls_resumed" in phases:
+        durations["tls_resumed"] = phases["tls_resumed"]
+    return durations
+
+
+def calc_wire_stats(byte_counts: Dict[str, int], transport: str, delivered: int) -> Dict[str, Any]:
+    """Splits the bytes sent and received by a client into payload, MQTT overhead of PUBLISH packets
+    (fixed/variable headers, topics and properties), all other MQTT packets (control_packets),
+    WebSocket framing and TLS record overhead. delivered is the number of messages (or samples or blobs)
+    that bytes_per_msg is worked out over.
+    Wire bytes are TCP payload bytes from TCP_INFO (-1 if unavailable). The WebSocket framing of
+    received data is estimated, and the WebSocket upgrade request and response count as WebSocket framing
+    without TLS and as TLS overhead with TLS."""
+    stats: Dict[str, Any] = {}
+    total_payload = 0
+    total_wire = 0
+    for direction in ["sent", "recv"]:
+        payload = byte_counts[f"payload_{direction}"]
+        mqtt_bytes = byte_counts[f"mqtt_{direction}"]
+        control = byte_counts[f"control_{direction}"]
+        wire = byte_counts[f"wire_{direction}"]
+        ws_framing = byte_counts[f"ws_framing_{direction}"] if transport in ("ws", "wss") else 0
+        tls_overhead = 0
+        if wire >= 0:
+            below_mqtt = wire - mqtt_bytes
+            if transport == "ws":
+                ws_framing = below_mqtt
+            elif transport in ("tls", "wss"):
+                tls_overhead = below_mqtt - ws_framing
+        else:
+            wire = mqtt_bytes + ws_framing
+        stats[direction] = {
+            "payload": payload,
+            "mqtt_overhead": mqtt_bytes - payload - control,
+            "control_packets": control,
+            "ws_framing": ws_framing,
+            "tls_overhead": tls_overhead,
+            "wire": wire,
+        }
+        total_payload += payload
+        total_wire += wire
+
+    stats["bytes_per_msg"] = total_wire / delivered if delivered else 0
+    stats["overhead_ratio"] = (total_wire - total_payload) / total_payload if total_payload else 0
+    stats["tcp_info"] = byte_counts["wire_sent"] >= 0
+    return stats
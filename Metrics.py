@@ -0,0 +1,121 @@
+import os
+import bisect
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+from util import latency_buckets
+
+
+class Metrics(object):
+    """Live counters and latency histograms for a client, rendered in Prometheus text format.
+    Updated from the paho callbacks, so every update only takes a lock and bumps a few ints."""
+
+    def __init__(self, role: str, labels: Dict[str, str], buckets: List[float] = None):
+        self.role = role
+        self.labels = ",".join(f'{k}="{v}"' for k, v in {"client": role, **labels}.items())
+        self.buckets = buckets or latency_buckets
+        self.lock = threading.Lock()
+        self.counters: Dict[str, int] = {}
+        self.histograms: Dict[str, Dict[str, object]] = {}
+        self.gauges: Dict[str, float] = {}
+        self._server = None
+        self._snapshot_task = None
+        self._snapshot_fname = ""
+
+    def inc(self, name: str, amount: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def get(self, name: str) -> int:
+        with self.lock:
+            return self.counters.get(name, 0)
+
+    def set(self, name: str, value: float):
+        with self.lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        with self.lock:
+            hist = self.histograms.get(name, None)
+            if hist is None:
+                hist = {"counts": [0] * (len(self.buckets) + 1), "sum": 0.0, "count": 0}
+                self.histograms[name] = hist
+            hist["counts"][bisect.bisect_left(self.buckets, value)] += 1
+            hist["sum"] += value
+            hist["count"] += 1
+
+    def render(self) -> str:
+        lines = []
+        with self.lock:
+            for name, value in self.counters.items():
+                lines.append(f"# TYPE mqtt_{name}_total counter")
+                lines.append(f"mqtt_{name}_total{{{self.labels}}} {value}")
+            for name, value in self.gauges.items():
+                lines.append(f"# TYPE mqtt_{name} gauge")
+                lines.append(f"mqtt_{name}{{{self.labels}}} {value}")
+            for name, hist in self.histograms.items():
+                lines.append(f"# TYPE mqtt_{name}_ms histogram")
+                cumulative = 0
+                for bound, count in zip(self.buckets + ["+Inf"], hist["counts"]):
+                    cumulative += count
+                    lines.append(
+                        f'mqtt_{name}_ms_bucket{{{self.labels},le="{bound}"}} {cumulative}'
+                    )
+                lines.append(f"mqtt_{name}_ms_sum{{{self.labels}}} {hist['sum']}")
+                lines.append(f"mqtt_{name}_ms_count{{{self.labels}}} {hist['count']}")
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int):
+        """Serves the metrics on http://0.0.0.0:<port>/metrics from a daemon thread"""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("", port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def write_snapshot(self, fname: str):
+        # write to a temporary file first so that readers never see a partial snapshot
+        with open(fname + ".tmp", "w") as snapshot_f:
+            snapshot_f.write(self.render())
+        os.replace(fname + ".tmp", fname)
+
+    def start_snapshots(self, fname: str, interval: float, scheduler):
+        """Rewrites fname with the current metrics every interval seconds"""
+        folder = os.path.dirname(fname)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        self._snapshot_fname = fname
+        self._snapshot_task = scheduler.every("metrics", interval, self.write_snapshot, fname)
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+        if self._snapshot_task is not None:
+            self._snapshot_task.cancel()
+            self.write_snapshot(self._snapshot_fname)
+
+
+def start_metrics(userdata, role: str) -> Metrics:
+    """Creates the client's Metrics and starts the exporters enabled in userdata"""
+    metrics = Metrics(
+        role, {"label": userdata["label"], "qos": userdata["qos"], "tls": userdata["tls"]}
+    )
+    if userdata["metrics_port"]:
+        metrics.serve(userdata["metrics_port"])
+    if userdata["metrics_file"]:
+        metrics.start_snapshots(
+            userdata["metrics_file"], userdata["metrics_interval"], userdata["scheduler"]
+        )
+    return metrics
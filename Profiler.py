@@ -0,0 +1,86 @@
+import os
+import re
+import sys
+import time
+import threading
+from collections import Counter
+from typing import Any, Dict, List
+
+
+class Profiler(object):
+    """Low-overhead sampling profiler for all threads of the client.
+    Every interval seconds it snapshots the stack of each thread with sys._current_frames()
+    and counts the collapsed stacks, which can be written out in the folded format read by
+    flamegraph.pl and speedscope. Its own CPU time is tracked to report the profiler's overhead."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        # thread name -> Counter of collapsed stacks
+        self.stacks: Dict[str, Counter] = {}
+        self.samples = 0
+        self.cpu_time = 0.0
+        self.start_time = -1.0
+        self.end_time = -1.0
+        self._event = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _collapse(frame) -> str:
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(
+                f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def sample(self):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own_ident = threading.get_ident()
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            name = names.get(ident, str(ident))
+            self.stacks.setdefault(name, Counter())[self._collapse(frame)] += 1
+        self.samples += 1
+
+    def _run(self):
+        cpu_start = time.thread_time()
+        while not self._event.wait(self.interval):
+            self.sample()
+        self.cpu_time = time.thread_time() - cpu_start
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._event.set()
+        self._thread.join()
+        self.end_time = time.perf_counter()
+
+    def dump(self, fname_base: str) -> List[str]:
+        """Writes one <fname_base>_<thread>.folded file per thread. Returns the file names."""
+        fnames = []
+        for name, stacks in self.stacks.items():
+            thread_name = re.sub(r"[^\w.-]+", "-", name).strip("-")
+            fname = f"{fname_base}_{thread_name}.folded"
+            with open(fname, "w") as folded_f:
+                for stack, count in stacks.most_common():
+                    folded_f.write(f"{stack} {count}\n")
+            fnames.append(fname)
+        return fnames
+
+    def summary(self, fnames: List[str]) -> Dict[str, Any]:
+        duration = self.end_time - self.start_time
+        return {
+            "files": fnames,
+            "interval": self.interval,
+            "samples": self.samples,
+            "duration": duration,
+            "profiler_cpu_time": self.cpu_time,
+            # fraction of one core used by the profiler for the duration of the run
+            "overhead": self.cpu_time / duration if duration > 0 else 0,
+        }
@@ -0,0 +1,106 @@
+import os
+import gc
+import time
+import resource
+import threading
+from typing import Any, Dict, List
+
+from util import get_time, calc_stats
+
+
+def read_rss() -> float:
+    """Returns the resident set size of the process in MB.
+    Falls back to the peak RSS where /proc is not available."""
+    try:
+        with open("/proc/self/statm", "r") as statm_f:
+            pages = int(statm_f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10
+
+
+class ResourceSampler(object):
+    """Samples the CPU usage, RSS and thread count of the client every interval seconds
+    from the client's Scheduler, and records every GC pause through gc.callbacks."""
+
+    def __init__(self, interval: float = 1.0):
+        self.interval = interval
+        self.samples: List[Dict[str, Any]] = []
+        self.gc_pauses: List[Dict[str, Any]] = []
+        self._gc_start = -1.0
+        self._task = None
+        self._last_cpu = 0.0
+        self._last_wall = 0.0
+        self._last_pauses = 0
+        self._gc_collections: List[int] = []
+
+    def _on_gc(self, phase: str, info: Dict[str, int]):
+        if phase == "start":
+            self._gc_start = time.perf_counter()
+        elif self._gc_start != -1:
+            self.gc_pauses.append(
+                {
+                    "time": get_time(),
+                    "generation": info["generation"],
+                    "collected": info["collected"],
+                    "pause": (time.perf_counter() - self._gc_start) * 1000,
+                }
+            )
+            self._gc_start = -1.0
+
+    def sample(self):
+        cpu = time.process_time()
+        wall = max(time.monotonic(), self._last_wall + 1e-6)
+        pauses = self.gc_pauses[self._last_pauses :]
+        self.samples.append(
+            {
+                "time": get_time(),
+                "cpu_percent": (cpu - self._last_cpu) / (wall - self._last_wall) * 100,
+                "rss_mb": read_rss(),
+                "threads": threading.active_count(),
+                "gc_collections": [stats["collections"] for stats in gc.get_stats()],
+                "gc_pause": sum(pause["pause"] for pause in pauses),
+            }
+        )
+        self._last_cpu = cpu
+        self._last_wall = wall
+        self._last_pauses += len(pauses)
+
+    def start(self, scheduler):
+        self._gc_collections = [stats["collections"] for stats in gc.get_stats()]
+        self._last_cpu = time.process_time()
+        self._last_wall = time.monotonic()
+        gc.callbacks.append(self._on_gc)
+        self._task = scheduler.every("resources", self.interval, self.sample)
+
+    def stop(self):
+        self._task.cancel()
+        gc.callbacks.remove(self._on_gc)
+        # last partial interval
+        self.sample()
+
+    def dump(self) -> Dict[str, Any]:
+        return {
+            "interval": self.interval,
+            "samples": self.samples,
+            "gc_pauses": self.gc_pauses,
+        }
+
+    def summary(self, fname: str) -> Dict[str, Any]:
+        summary = {
+            "file": fname,
+            "interval": self.interval,
+            "samples": len(self.samples),
+            "cpu_percent": calc_stats(self.samples, "cpu_percent"),
+            "rss_mb": calc_stats(self.samples, "rss_mb"),
+            "rss_growth_mb": self.samples[-1]["rss_mb"] - self.samples[0]["rss_mb"],
+            "max_threads": max(sample["threads"] for sample in self.samples),
+            "gc_collections": [
+                end - start
+                for start, end in zip(self._gc_collections, self.samples[-1]["gc_collections"])
+            ],
+            "gc_pause_total": sum(pause["pause"] for pause in self.gc_pauses),
+        }
+        if self.gc_pauses:
+            summary["gc_pause"] = calc_stats(self.gc_pauses, "pause")
+        return summary
@@ -0,0 +1,190 @@
+import bisect
+import heapq
+import itertools
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional
+
+# lateness histogram bucket upper bounds in ms
+lateness_buckets = [0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 1000]
+
+
+class Task(object):
+    """A callback registered with a Scheduler.
+    Periodic tasks run until they are cancelled or their callback returns False,
+    one-off tasks have no interval."""
+
+    def __init__(
+        self,
+        name: str,
+        fn: Callable,
+        args: tuple,
+        deadline: float,
+        interval: Optional[float] = None,
+        skip_missed: bool = True,
+    ):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.deadline = deadline
+        self.interval = interval
+        self.skip_missed = skip_missed
+        self.done = threading.Event()
+
+    def cancel(self):
+        self.done.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the task has run for the last time or was cancelled"""
+        return self.done.wait(timeout)
+
+
+class Scheduler(object):
+    """Runs the periodic and one-off tasks of a client on a single thread.
+    Deadlines are absolute times on the monotonic clock and a periodic task's next deadline is its
+    previous deadline plus its interval, so the time its callback takes does not make it drift.
+    The thread sleeps until spin seconds before a deadline and busy-waits the rest, which keeps
+    sub-millisecond intervals on time. How late every run started is recorded per task name,
+    as running totals and a histogram so that long runs at short intervals do not pile up floats."""
+
+    def __init__(self, spin: float = 0.001):
+        self.spin = spin
+        # task name -> runs, missed runs and lateness (ms) totals and histogram counts
+        self.stats: Dict[str, Dict[str, Any]] = {}
+        self._heap: List[tuple] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def _push(self, task: Task):
+        with self._cond:
+            heapq.heappush(self._heap, (task.deadline, next(self._counter), task))
+            self._cond.notify()
+
+    def _add_stats(self, name: str):
+        if name not in self.stats:
+            self.stats[name] = {
+                "runs": 0,
+                "missed": 0,
+                "lateness_sum": 0.0,
+                "lateness_min": float("inf"),
+                "lateness_max": float("-inf"),
+                "lateness_counts": [0] * (len(lateness_buckets) + 1),
+            }
+
+    def at(self, name: str, deadline: float, fn: Callable, *args) -> Task:
+        """Runs fn(*args) once at deadline, a time.monotonic() time"""
+        self._add_stats(name)
+        task = Task(name, fn, args, deadline)
+        self._push(task)
+        return task
+
+    def after(self, name: str, delay: float, fn: Callable, *args) -> Task:
+        """Runs fn(*args) once in delay seconds"""
+        return self.at(name, time.monotonic() + delay, fn, *args)
+
+    def every(
+        self,
+        name: str,
+        interval: float,
+        fn: Callable,
+        *args,
+        delay: Optional[float] = None,
+        skip_missed: bool = True,
+    ) -> Task:
+        """Runs fn(*args) every interval seconds, starting in delay seconds (one interval by default).
+        If the thread falls more than an interval behind, the runs that were missed are skipped,
+        or run back to back to catch up if skip_missed is False.
+        An interval of 0 runs fn back to back, taking turns with any other task that is due."""
+        if interval < 0:
+            raise ValueError(f"Negative interval {interval} for task {name}")
+        self._add_stats(name)
+        start = time.monotonic() + (interval if delay is None else delay)
+        task = Task(name, fn, args, start, interval, skip_missed)
+        self._push(task)
+        return task
+
+    def _run_task(self, task: Task, deadline: float):
+        stats = self.stats[task.name]
+        lateness = (time.monotonic() - deadline) * 1000
+        stats["lateness_sum"] += lateness
+        stats["lateness_min"] = min(stats["lateness_min"], lateness)
+        stats["lateness_max"] = max(stats["lateness_max"], lateness)
+        stats["lateness_counts"][bisect.bisect_left(lateness_buckets, lateness)] += 1
+        stats["runs"] += 1
+        try:
+            keep_running = task.fn(*task.args)
+        except Exception:
+            traceback.print_exc()
+            keep_running = False
+        if task.interval is None or keep_running is False or task.done.is_set():
+            task.done.set()
+            return
+
+        if task.interval == 0:
+            # after the tasks that became due meanwhile
+            task.deadline = time.monotonic()
+            self._push(task)
+            return
+        task.deadline = deadline + task.interval
+        late = time.monotonic() - task.deadline
+        if task.skip_missed and late >= task.interval:
+            missed = int(late // task.interval)
+            stats["missed"] += missed
+            task.deadline += missed * task.interval
+        self._push(task)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    remaining = self._heap[0][0] - time.monotonic()
+                    if remaining <= self.spin:
+                        break
+                    self._cond.wait(remaining - self.spin)
+                if self._stopped:
+                    return
+                deadline, _, task = heapq.heappop(self._heap)
+            if task.done.is_set():
+                continue
+            while time.monotonic() < deadline:
+                # yield the GIL, so that paho's network thread can run during the spin
+                time.sleep(0)
+            self._run_task(task, deadline)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the thread after the task that is running, and cancels the remaining tasks"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+        for _, _, task in self._heap:
+            task.cancel()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "runs": stats["runs"],
+                "missed": stats["missed"],
+                "lateness": {
+                    "count": stats["runs"],
+                    "min": stats["lateness_min"],
+                    "max": stats["lateness_max"],
+                    "mean": stats["lateness_sum"] / stats["runs"],
+                    "histogram": {"buckets": lateness_buckets, "counts": stats["lateness_counts"]},
+                }
+                if stats["runs"]
+                else {},
+            }
+            for name, stats in self.stats.items()
+        }
@@ -0,0 +1,91 @@
+from typing import Any, Dict, List, Optional
+
+
+class SeqTracker(object):
+    """Tracks the sequence numbers received from one publisher stream in a bitmap (1 bit per message).
+    add() is O(1), so duplicates and reordering are counted as messages arrive,
+    while losses and gap lengths are worked out from the bitmap once at the end of the run."""
+
+    def __init__(self):
+        self.bitmap = bytearray()
+        self.max_seq = 0
+        self.unique = 0
+        self.duplicates = 0
+        self.out_of_order = 0
+        self.max_reorder_distance = 0
+
+    def add(self, seq_num: int) -> bool:
+        """Records seq_num. Returns False if it is a duplicate."""
+        byte_idx, bit = divmod(seq_num, 8)
+        if byte_idx >= len(self.bitmap):
+            # grow geometrically to keep appends amortised O(1)
+            self.bitmap.extend(bytes(max(byte_idx + 1 - len(self.bitmap), len(self.bitmap))))
+        if self.bitmap[byte_idx] & (1 << bit):
+            self.duplicates += 1
+            return False
+
+        self.bitmap[byte_idx] |= 1 << bit
+        self.unique += 1
+        if seq_num < self.max_seq:
+            self.out_of_order += 1
+            self.max_reorder_distance = max(self.max_reorder_distance, self.max_seq - seq_num)
+        else:
+            self.max_seq = seq_num
+        return True
+
+    def has(self, seq_num: int) -> bool:
+        byte_idx, bit = divmod(seq_num, 8)
+        return byte_idx < len(self.bitmap) and bool(self.bitmap[byte_idx] & (1 << bit))
+
+    def gaps(self, total_packets: int, expected: Optional[List[int]] = None):
+        """Yields the length of every run of missing seq nums in 1..total_packets,
+        or among the sorted seq nums in expected if only those were sent to the subscriber"""
+        if expected is not None:
+            gap = 0
+            for seq_num in expected:
+                if self.has(seq_num):
+                    if gap:
+                        yield gap
+                        gap = 0
+                else:
+                    gap += 1
+            if gap:
+                yield gap
+            return
+        gap = 0
+        seq_num = 1
+        last = max(total_packets, self.max_seq)
+        while seq_num <= last:
+            byte_idx = seq_num // 8
+            # skip over fully received bytes
+            if seq_num % 8 == 0 and byte_idx < len(self.bitmap) and self.bitmap[byte_idx] == 0xFF:
+                if gap:
+                    yield gap
+                    gap = 0
+                seq_num += 8
+                continue
+            if self.has(seq_num):
+                if gap:
+                    yield gap
+                    gap = 0
+            else:
+                gap += 1
+            seq_num += 1
+        if gap:
+            yield gap
+
+    def summary(self, total_packets: int, expected: Optional[List[int]] = None) -> Dict[str, Any]:
+        gaps = list(self.gaps(total_packets, expected))
+        lost = sum(gaps)
+        sent = len(expected) if expected is not None else max(total_packets, self.max_seq)
+        return {
+            "unique": self.unique,
+            "duplicates": self.duplicates,
+            "out_of_order": self.out_of_order,
+            "max_reorder_distance": self.max_reorder_distance,
+            "lost": lost,
+            "loss": lost / sent if sent else 0,
+            "gap_count": len(gaps),
+            "max_gap": max(gaps) if gaps else 0,
+            "mean_gap": lost / len(gaps) if gaps else 0,
+        }
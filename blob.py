@@ -0,0 +1,119 @@
+import os
+import mmap
+import struct
+import zlib
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+
+# seq_num, chunk_idx, n_chunks, blob_len, send_time, crc32
+BLOB_HEADER = struct.Struct("!IIIQdI")
+
+
+def load_blob(size_kb: float, fname: str = "") -> memoryview:
+    """Returns a read-only view over the blob to be published.
+    If fname is given, the file is memory-mapped instead of read into memory,
+    otherwise a buffer of size_kb random bytes is preallocated once for the whole run.
+    """
+    if fname:
+        with open(fname, "rb") as blob_f:
+            buf = mmap.mmap(blob_f.fileno(), 0, access=mmap.ACCESS_READ)
+    else:
+        buf = os.urandom(int(size_kb * 1024))
+    return memoryview(buf)
+
+
+def iter_chunks(blob: memoryview, chunk_size_kb: float) -> Iterator[Tuple[int, int, memoryview]]:
+    """Yields (chunk_idx, n_chunks, chunk) where chunk is a slice of blob (no copy).
+    A chunk_size_kb of 0 sends the whole blob as a single chunk."""
+    chunk_len = int(chunk_size_kb * 1024) or len(blob) or 1
+    n_chunks = max(1, -(-len(blob) // chunk_len))
+    for idx in range(n_chunks):
+        yield idx, n_chunks, blob[idx * chunk_len : (idx + 1) * chunk_len]
+
+
+def pack_chunk(
+    seq_num: int,
+    chunk_idx: int,
+    n_chunks: int,
+    blob_len: int,
+    send_time: float,
+    crc: int,
+    chunk: memoryview,
+) -> bytes:
+    """Prepends the blob header to chunk.
+    paho only accepts bytes/bytearray payloads, so this join is the single copy made per message."""
+    header = BLOB_HEADER.pack(seq_num, chunk_idx, n_chunks, blob_len, send_time, crc)
+    return b"".join((header, chunk))
+
+
+def blob_crc(blob: memoryview) -> int:
+    return zlib.crc32(blob)
+
+
+class BlobAssembler(object):
+    """Reassembles chunked blobs on the subscriber side.
+    Chunks are written straight into a buffer preallocated from the header's blob_len,
+    so each blob is copied once regardless of how many chunks it arrives in.
+    Chunks that arrive more than once are counted in duplicates."""
+
+    def __init__(self):
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        self.completed = set()
+        self.duplicates = 0
+
+    def add(self, payload: bytes, rcv_time: float) -> Optional[Dict[str, Any]]:
+        """Adds a chunk. Returns a record for the blob once all of its chunks have arrived."""
+        seq_num, chunk_idx, n_chunks, blob_len, send_time, crc = BLOB_HEADER.unpack_from(
+            payload
+        )
+        if seq_num in self.completed:
+            # QoS 1 duplicate of a blob that has already been reassembled
+            self.duplicates += 1
+            return None
+        blob = self.pending.get(seq_num, None)
+        if blob is None:
+            blob = {
+                "buf": bytearray(blob_len),
+                "seen": bytearray(n_chunks),
+                "remaining": n_chunks,
+                "first_rcv_time": rcv_time,
+            }
+            self.pending[seq_num] = blob
+
+        if blob["seen"][chunk_idx]:
+            # QoS 1 duplicate
+            self.duplicates += 1
+            return None
+        blob["seen"][chunk_idx] = 1
+        blob["remaining"] -= 1
+
+        chunk = memoryview(payload)[BLOB_HEADER.size :]
+        if chunk_idx < n_chunks - 1:
+            offset = chunk_idx * len(chunk)
+        else:
+            offset = blob_len - len(chunk)
+        blob["buf"][offset : offset + len(chunk)] = chunk
+
+        if blob["remaining"] > 0:
+            return None
+
+        del self.pending[seq_num]
+        self.completed.add(seq_num)
+        return {
+            "seq_num": seq_num,
+            "send_time": send_time,
+            "first_rcv_time": blob["first_rcv_time"],
+            "rcv_time": rcv_time,
+            "time_diff": rcv_time - send_time,
+            "size": blob_len,
+            "chunks": n_chunks,
+            "crc_ok": zlib.crc32(blob["buf"]) == crc,
+        }
+
+
+def goodput(total_bytes: int, start_time: float, end_time: float) -> float:
+    """Returns goodput in MB/s given start and end times in ms."""
+    duration = end_time - start_time
+    if duration <= 0:
+        return 0
+    return total_bytes / duration / 1000
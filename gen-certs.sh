@@ -0,0 +1,18 @@
+#!/usr/bin/env bash
+
+# Generates a self-signed CA and a broker certificate for a local TLS broker (see mosquitto-tls.conf).
+# Clients trust the CA by setting ca_certs: certs/ca.crt in the input file.
+certDir="certs"
+hostname=${1:-localhost}
+mkdir -p $certDir
+
+openssl req -x509 -newkey rsa:2048 -nodes -days 365 \
+    -keyout $certDir/ca.key -out $certDir/ca.crt -subj "/CN=mqtt-experiments-ca"
+openssl req -newkey rsa:2048 -nodes \
+    -keyout $certDir/server.key -out $certDir/server.csr -subj "/CN=$hostname"
+openssl x509 -req -in $certDir/server.csr -days 365 \
+    -CA $certDir/ca.crt -CAkey $certDir/ca.key -CAcreateserial \
+    -extfile <(printf "subjectAltName=DNS:%s,IP:127.0.0.1" "$hostname") \
+    -out $certDir/server.crt
+rm $certDir/server.csr
+echo "Certificates written to $certDir/"
@@ -0,0 +1,254 @@
+import json
+import glob
+import argparse
+import datetime
+import statistics
+import os
+from typing import Any, Dict, List, Optional
+
+from util import (
+    parse_yaml,
+    calc_stats,
+    calc_throughput,
+    calc_conn_phase_stats,
+    generate_topics,
+    generate_filters,
+    subscribed_seq_nums,
+    hostname,
+    transport,
+)
+from SeqTracker import SeqTracker
+
+
+def load_members(userdata) -> List[Dict[str, Any]]:
+    """Returns the summaries written by the members of the consumer group in this run"""
+    member_glob = (
+        f"summary/{userdata['share_group']}/"
+        + "_qos"
+        + str(userdata["qos"])
+        + "_"
+        + userdata["label"]
+        + ("_tls" if userdata["tls"] else "")
+        + "_*.json"
+    )
+    members = []
+    for member_fname in sorted(glob.glob(member_glob)):
+        with open(member_fname, "r") as member_f:
+            members.append({"fname": member_fname, **json.load(member_f)["subscriber"]})
+    return members
+
+
+def load_send_times(pub_data_fname: str) -> Dict[int, float]:
+    """Returns {seq_num: send_time} of every sample sent by the publisher"""
+    with open(pub_data_fname, "r") as pub_f:
+        pub_data = json.load(pub_f)
+    send_times = {}
+    for pkt in pub_data:
+        # batched messages list their samples, other messages are a single sample
+        for seq_num, send_time in pkt.get("batch", [[pkt["seq_num"], pkt["publishing_time"]]]):
+            if seq_num != -1:
+                send_times[seq_num] = send_time
+    return send_times
+
+
+def calc_skew(counts: List[int]) -> Dict[str, Any]:
+    """How evenly the messages were spread over the members of the group.
+    max_over_mean is 1 for a perfectly balanced group."""
+    mean = statistics.mean(counts)
+    return {
+        "counts": counts,
+        "min_share": min(counts) / sum(counts) if sum(counts) else 0,
+        "max_share": max(counts) / sum(counts) if sum(counts) else 0,
+        "max_over_mean": max(counts) / mean if mean else 0,
+        "cv": statistics.pstdev(counts) / mean if mean else 0,
+    }
+
+
+def calc_disconnect_stats(
+    disconnects: List[Dict[str, Any]], send_times: Dict[int, float], received: Dict[int, int]
+) -> Dict[str, Any]:
+    """Loss and duplicates among the samples sent while a member of the group was disconnected"""
+    in_window = set()
+    for disconnect in disconnects:
+        in_window.update(
+            seq_num
+            for seq_num, send_time in send_times.items()
+            if disconnect["disconnect_time"] <= send_time <= disconnect["reconnect_time"]
+        )
+    outside = set(send_times) - in_window
+    return {
+        "disconnects": len(disconnects),
+        "sent_during": len(in_window),
+        "lost_during": sum(1 for seq_num in in_window if not received.get(seq_num, 0)),
+        "dup_during": sum(1 for seq_num in in_window if received.get(seq_num, 0) > 1),
+        "lost_outside": sum(1 for seq_num in outside if not received.get(seq_num, 0)),
+        "dup_outside": sum(1 for seq_num in outside if received.get(seq_num, 0) > 1),
+    }
+
+
+def calc_group_stats(
+    members: List[Dict[str, Any]],
+    pub_summary: Dict[str, Any],
+    total_packets: int,
+    expected: Optional[List[int]] = None,
+):
+    """Returns the subscriber stats of the whole group and the consumer group stats.
+    Messages redelivered to another member count as duplicates of the group. expected are the
+    seq nums sent to the topics the group subscribed to, if it left out some topics."""
+    samples = []
+    disconnects = []
+    counts = []
+    for member in members:
+        with open(member["e2e_data_file"], "r") as data_f:
+            member_data = json.load(data_f)
+        member_samples = [pkt for pkt in member_data if pkt["seq_num"] != -1]
+        counts.append(len(member_samples))
+        samples.extend(member_samples)
+        end_time = max((pkt["rcv_time"] for pkt in member_samples), default=-1)
+        for pkt in member_data:
+            if pkt["seq_num"] == -1:
+                disconnects.append(
+                    {
+                        "client_id": member["client_id"],
+                        "disconnect_time": pkt["disconnect_time"],
+                        "reconnect_time": pkt["reconnect_time"]
+                        if pkt["reconnect_time"] != -1
+                        else max(end_time, pkt["disconnect_time"]),
+                    }
+                )
+
+    tracker = SeqTracker()
+    received: Dict[int, int] = {}
+    for pkt in sorted(samples, key=lambda pkt: pkt["rcv_time"]):
+        tracker.add(pkt["seq_num"])
+        received[pkt["seq_num"]] = received.get(pkt["seq_num"], 0) + 1
+    seq_stats = tracker.summary(total_packets, expected)
+
+    subscriber = {
+        "label": members[0]["label"],
+        "share_group": members[0]["share_group"],
+        "tls": members[0]["tls"],
+        "transport": members[0]["transport"],
+        "qos": members[0]["qos"],
+        "pkt_sent": total_packets,
+        "pkt_recv": len(samples),
+        "pkt_expected": len(expected) if expected is not None else total_packets,
+        "pkt_loss": seq_stats["loss"],
+        "pkt_dup": seq_stats["duplicates"],
+        "pkt_reordered": seq_stats["out_of_order"],
+        "seq_stats": {"group": seq_stats},
+        "throughput": calc_throughput(
+            seq_stats["unique"],
+            min(pkt["send_time"] for pkt in samples),
+            max(pkt["rcv_time"] for pkt in samples),
+        ),
+        "e2e_delay": calc_stats(samples),
+    }
+    group = {
+        "members": len(members),
+        "member_throughput": {member["client_id"]: member["throughput"] for member in members},
+        "member_e2e_delay": {
+            member["client_id"]: member["e2e_delay"]["mean"] for member in members
+        },
+        "skew": calc_skew(counts),
+    }
+    conn_data = []
+    for member in members:
+        if "conn_data_file" in member:
+            with open(member["conn_data_file"], "r") as conn_f:
+                conn_data.extend(json.load(conn_f))
+    if conn_data:
+        # the connects of all members, eg. to compare handshakes under a reconnect storm
+        subscriber["conn_delay"] = calc_stats(conn_data)
+        subscriber["conn_tries"] = calc_stats(conn_data, "tries")
+        subscriber["conn_phases"] = calc_conn_phase_stats(conn_data)
+    if "pub_data_file" in pub_summary:
+        send_times = load_send_times(pub_summary["pub_data_file"])
+        if expected is not None:
+            send_times = {seq_num: send_times[seq_num] for seq_num in expected if seq_num in send_times}
+        group["disconnect_stats"] = calc_disconnect_stats(disconnects, send_times, received)
+    return subscriber, group
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="group-summary",
+        usage="Usage: python group-summary.py -f <input-file-path>",
+    )
+    parser.add_argument(
+        "-f",
+        "--file",
+        help="Path to file with input variables",
+        required=False,
+        default="",
+    )
+    args = parser.parse_args()
+
+    userdata: Dict[str, Any] = {
+        "qos": 0,
+        "label": "normal",
+        "tls": False,
+        "total_packets": 50,
+        "hostname": hostname,
+        "port": 0,
+        "transport": transport,
+        "share_group": "",
+        "topic_root": "test",
+        "topic_depth": 0,
+        "topic_fanout": 1,
+        "topic_filters": [],
+        "sub_exact": 0,
+        "sub_plus": 0,
+        "sub_hash": 0,
+    }
+    userdata = parse_yaml(args.file, userdata, "subscriber")
+    if not userdata["share_group"]:
+        raise ValueError("share_group is not set")
+    # the same filters as the members, see sub-client.py
+    topics = generate_topics(userdata["topic_root"], userdata["topic_depth"], userdata["topic_fanout"])
+    topic_filters = userdata["topic_filters"] or generate_filters(
+        topics, userdata["topic_root"], userdata["sub_exact"], userdata["sub_plus"], userdata["sub_hash"]
+    )
+
+    members = load_members(userdata)
+    if not members:
+        raise ValueError(f"No member summaries found for share_group {userdata['share_group']}")
+    print(f"Merging the summaries of {len(members)} members")
+
+    stats_folder = "summary/"
+    stats_fname = (
+        stats_folder
+        + "_qos"
+        + str(userdata["qos"])
+        + "_"
+        + userdata["label"]
+        + ("_tls" if userdata["tls"] else "")
+        + ".json"
+    )
+    with open(stats_fname, "r+") as stats_f:
+        cur_data = json.load(stats_f)
+        subscriber, group = calc_group_stats(
+            members,
+            cur_data.get("publisher", {}),
+            userdata["total_packets"],
+            subscribed_seq_nums(topics, topic_filters, userdata["total_packets"]),
+        )
+        stats_f.seek(0)
+        json.dump({**cur_data, "subscriber": subscriber, "consumer_group": group}, stats_f)
+
+    # date the summaries like sub-client.py so that the next run starts afresh
+    cur_date = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    for member in members:
+        member_folder, member_fname = os.path.split(member["fname"])
+        os.rename(member["fname"], os.path.join(member_folder, cur_date + member_fname))
+    os.rename(
+        stats_fname,
+        stats_folder
+        + cur_date
+        + "_qos"
+        + str(userdata["qos"])
+        + "_"
+        + userdata["label"]
+        + ("_tls" if userdata["tls"] else "")
+        + ".json",
+    )
@@ -0,0 +1,73 @@
+from statistics import mean
+import os
+import json
+
+# EDIT THESE VALUES
+directory = "summary"
+baseline = "batch1"
+
+# DO NOT EDIT FROM HERE ONWARDS
+metrics = {
+    # unbatched runs report per message, which is the same as per sample
+    "samples/s": [("publisher", "batching", "sample_throughput"), ("publisher", "throughput")],
+    "bytes/sample": [
+        ("publisher", "batching", "bytes_per_sample"),
+        ("publisher", "wire", "bytes_per_msg"),
+    ],
+    "linger (ms)": [("publisher", "batching", "linger")],
+    "e2e delay (ms)": [("subscriber", "e2e_delay")],
+}
+
+
+def get_value(content, keys):
+    value = content
+    for key in keys:
+        value = value.get(key, None) if isinstance(value, dict) else None
+    if isinstance(value, dict):
+        value = value["mean"]
+    return value
+
+
+def read_data():
+    """Returns {label: {metric: [value of each run]}}"""
+    data = {}
+    for filename in os.listdir(directory):
+        f = os.path.join(directory, filename)
+        if not os.path.isfile(f):
+            continue
+        with open(f, "r") as fp:
+            content = json.load(fp)
+        if "publisher" not in content or "subscriber" not in content:
+            continue
+        label = content["publisher"]["label"]
+        for metric, candidates in metrics.items():
+            for keys in candidates:
+                value = get_value(content, keys)
+                if value is not None:
+                    data.setdefault(label, {}).setdefault(metric, []).append(value)
+                    break
+    return data
+
+
+def main():
+    data = read_data()
+    base = data.get(baseline, {})
+    print("label".ljust(16) + "".join(metric.rjust(24) for metric in metrics))
+    for label in sorted(data):
+        row = label.ljust(16)
+        for metric in metrics:
+            values = data[label].get(metric, [])
+            if not values:
+                row += "-".rjust(24)
+                continue
+            value = mean(values)
+            cell = f"{value:.2f}"
+            if label != baseline and base.get(metric, None) and mean(base[metric]):
+                change = (value / mean(base[metric]) - 1) * 100
+                cell += f" ({change:+.1f}%)"
+            row += cell.rjust(24)
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
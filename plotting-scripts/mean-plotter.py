@@ -30,6 +30,12 @@ labels = ["0.01KB", "0.1KB", "0.2KB"]
 #     "disconnect_1_in_10",
 #     "disconnect_1_in_5",
 # ]
+
+# test_var = "topics"
+# directory = "summary"
+# x_data = [1, 10, 100, 1000]
+# x_title = "Topic Count"
+# labels = ["topics1_subs1", "topics10_subs1", "topics100_subs1", "topics1000_subs1"]
 html_dir = "html"
 
 # DO NOT EDIT FROM HERE ONWARDS
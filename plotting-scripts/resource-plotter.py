@@ -0,0 +1,93 @@
+from plotly.subplots import make_subplots
+import plotly.graph_objects as go
+
+import os
+import json
+
+# EDIT THESE VALUES
+directory = "summary"
+html_dir = "resource-html"
+
+# DO NOT EDIT FROM HERE ONWARDS
+clients = {
+    # client: (data file key, x value of a message, title of the latency plot)
+    "publisher": ("pub_data_file", "publishing_time", "Publishing Delay (ms)"),
+    "subscriber": ("e2e_data_file", "rcv_time", "End-to-End Delay (ms)"),
+}
+resource_rows = [
+    ("cpu_percent", "CPU (%)"),
+    ("rss_mb", "RSS (MB)"),
+    ("gc_pause", "GC Pause (ms)"),
+    ("threads", "Threads"),
+]
+
+
+def create_plot(name, client, summary):
+    data_key, time_key, latency_title = clients[client]
+    with open(summary[data_key], "r") as fp:
+        messages = [msg for msg in json.load(fp) if msg.get("seq_num", -1) != -1]
+    with open(summary["resources"]["file"], "r") as fp:
+        resources = json.load(fp)
+    start_time = min(
+        [msg[time_key] for msg in messages] + [s["time"] for s in resources["samples"]]
+    )
+
+    fig = make_subplots(
+        rows=len(resource_rows) + 1,
+        cols=1,
+        shared_xaxes=True,
+        subplot_titles=[latency_title] + [title for _, title in resource_rows],
+    )
+    fig.update_layout(title=f"{client}: {summary['label']}", height=250 * (len(resource_rows) + 1))
+    fig.update_xaxes(title_text="Time (s)", row=len(resource_rows) + 1, col=1)
+    fig.add_trace(
+        go.Scatter(
+            x=[(msg[time_key] - start_time) / 1000 for msg in messages],
+            y=[msg["time_diff"] for msg in messages],
+            mode="markers",
+            name=latency_title,
+        ),
+        row=1,
+        col=1,
+    )
+    for i, (key, title) in enumerate(resource_rows):
+        fig.add_trace(
+            go.Scatter(
+                x=[(s["time"] - start_time) / 1000 for s in resources["samples"]],
+                y=[s[key] for s in resources["samples"]],
+                mode="lines+markers",
+                name=title,
+            ),
+            row=i + 2,
+            col=1,
+        )
+    # individual GC pauses, on top of the per-interval totals
+    fig.add_trace(
+        go.Scatter(
+            x=[(p["time"] - start_time) / 1000 for p in resources["gc_pauses"]],
+            y=[p["pause"] for p in resources["gc_pauses"]],
+            mode="markers",
+            name="GC Pause (each collection)",
+        ),
+        row=[key for key, _ in resource_rows].index("gc_pause") + 2,
+        col=1,
+    )
+    fig.write_html(f"{html_dir}/{name}_{client}.html")
+
+
+def main():
+    if not os.path.isdir(html_dir):
+        os.makedirs(html_dir)
+    for filename in os.listdir(directory):
+        f = os.path.join(directory, filename)
+        if not os.path.isfile(f):
+            continue
+        with open(f, "r") as fp:
+            content = json.load(fp)
+        for client in clients:
+            if "resources" in content.get(client, {}):
+                create_plot(filename[: -len(".json")], client, content[client])
+
+
+if __name__ == "__main__":
+    main()
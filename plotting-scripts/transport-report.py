@@ -0,0 +1,69 @@
+from statistics import mean
+import os
+import json
+
+# EDIT THESE VALUES
+directory = "summary"
+transports = ["tcp", "ws", "tls", "wss"]
+
+# DO NOT EDIT FROM HERE ONWARDS
+metrics = {
+    "pub throughput (msg/s)": ("publisher", "throughput"),
+    "sub throughput (msg/s)": ("subscriber", "throughput"),
+    "pub delay (ms)": ("publisher", "pub_delay"),
+    "e2e delay (ms)": ("subscriber", "e2e_delay"),
+    "sub conn delay (ms)": ("subscriber", "conn_delay"),
+    "pub bytes/msg": ("publisher", "wire", "bytes_per_msg"),
+    "sub bytes/msg": ("subscriber", "wire", "bytes_per_msg"),
+}
+
+
+def read_data():
+    """Returns {transport: {metric: [value of each run]}}"""
+    data = {}
+    for filename in os.listdir(directory):
+        f = os.path.join(directory, filename)
+        if not os.path.isfile(f):
+            continue
+        with open(f, "r") as fp:
+            content = json.load(fp)
+        if "publisher" not in content or "subscriber" not in content:
+            continue
+        transport = content["publisher"].get("transport", None)
+        if transport not in transports:
+            continue
+        for metric, (client, *keys) in metrics.items():
+            value = content[client]
+            for key in keys:
+                value = value.get(key, None) if isinstance(value, dict) else None
+            if isinstance(value, dict):
+                value = value["mean"]
+            if value is not None:
+                data.setdefault(transport, {}).setdefault(metric, []).append(value)
+    return data
+
+
+def main():
+    data = read_data()
+    baseline = data.get("tcp", {})
+    print("transport".ljust(10) + "".join(metric.rjust(26) for metric in metrics))
+    for transport in transports:
+        if transport not in data:
+            continue
+        row = transport.ljust(10)
+        for metric in metrics:
+            values = data[transport].get(metric, [])
+            if not values:
+                row += "-".rjust(26)
+                continue
+            value = mean(values)
+            cell = f"{value:.2f}"
+            if transport != "tcp" and baseline.get(metric, None):
+                overhead = (value / mean(baseline[metric]) - 1) * 100
+                cell += f" ({overhead:+.1f}%)"
+            row += cell.rjust(26)
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
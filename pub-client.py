@@ -6,23 +6,40 @@ from paho.mqtt.properties import Properties
 from paho.mqtt.reasoncodes import ReasonCodes
 import argparse
 import time
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 import os
 import yaml
 import threading
+import csv
 
-# from RepeatedTimer import RepeatedTimer
 from util import (
     dump_data,
     calc_stats,
     get_time,
     record_connect,
     connect_to_broker,
-    transport,
     parse_yaml,
+    paho_transport,
+    hostname,
+    transport,
+    calc_conn_phase_stats,
+    calc_throughput,
+    generate_topics,
+    calc_histogram,
+    get_data_fname,
 )
-
-send_interval = 1.0
+from InstrumentedClient import (
+    InstrumentedClient,
+    ResumableSSLContext,
+    calc_stage_durations,
+    calc_connect_durations,
+    calc_wire_stats,
+)
+from Metrics import start_metrics
+from Profiler import Profiler
+from ResourceSampler import ResourceSampler
+from Scheduler import Scheduler
+from blob import load_blob, iter_chunks, pack_chunk, blob_crc, goodput
 
 
 def on_connect(
@@ -32,14 +49,31 @@ def on_connect(
     reason: ReasonCodes,
     properties: Properties,
 ):
-    record_connect(userdata)
+    record_connect(userdata, calc_connect_durations(client.connect_phases))
     print("Connected with reason code " + reason.getName())
+    # paho resends unacknowledged messages after on_connect() returns
+    reset_topic_aliases(client, userdata, getattr(properties, "TopicAliasMaximum", 0))
 
     # Subscribing in on_connect() means that if we lose the connection and
     # reconnect then subscriptions will be renewed.
     userdata["connected"] = True
 
 
+def on_disconnect(client: mqtt.Client, userdata: Dict[str, Any], rc: int, properties: Properties):
+    # no aliases until the broker's TopicAliasMaximum is known on the next connection
+    reset_topic_aliases(client, userdata, 0)
+
+
+def reset_topic_aliases(client: InstrumentedClient, userdata: Dict[str, Any], alias_max: int):
+    """Topic aliases only last for one connection. Called on the network thread, so the alias_lock
+    keeps publish() on the scheduler thread from using an alias of the previous connection."""
+    with userdata["alias_lock"]:
+        topics = {alias: topic for topic, alias in userdata["topic_aliases"].items()}
+        client.strip_topic_aliases(topics, userdata["stream_props"])
+        userdata["topic_aliases"] = {}
+        userdata["topic_alias_max"] = alias_max
+
+
 def on_publish(client: mqtt.Client, userdata: Dict[str, Any], mid: int):
     """QoS 0: called when message has left the publisher
     QoS 1 & 2: called when handshakes have completed"""
@@ -61,9 +95,11 @@ def on_publish(client: mqtt.Client, userdata: Dict[str, Any], mid: int):
         userdata["data"][mid]["time_diff"] = (
             p_time - userdata["data"][mid]["publishing_time"]
         )
+        userdata["metrics"].observe("pub_delay", userdata["data"][mid]["time_diff"])
     userdata["lock"].release()
 
     userdata["published_count"] += 1
+    update_sent_metrics(userdata["metrics"], acked=1)
 
     # userdata["curr_seq_num"] += 1
 
@@ -72,44 +108,307 @@ def on_log(client: mqtt.Client, userdata: Dict[str, Any], level: int, buf: str):
     print(f"[{level}] {buf}")
 
 
-def send_packets(userdata):
-    while userdata["curr_seq_num"] <= userdata["total_packets"]:
-        cur_time: float = get_time()
-        seq_num = userdata["curr_seq_num"]
+def calc_stage_stats(list_data):
+    """Stats and histograms of the QoS handshake stages recorded by InstrumentedClient"""
+    stage_stats = {}
+    for stage in ["queue_time", "puback_time", "pubrec_time", "pubrel_time", "pubcomp_time"]:
+        stage_data = [pkt for pkt in list_data if stage in pkt]
+        if stage_data:
+            stage_stats[stage] = {
+                **calc_stats(stage_data, stage),
+                "histogram": calc_histogram(stage_data, stage),
+            }
+    return stage_stats
+
 
-        msg: mqtt.MQTTMessageInfo = client.publish(
-            "test", f"{seq_num} {cur_time}", userdata["qos"]
+def update_sent_metrics(metrics, sent=0, acked=0):
+    metrics.inc("messages_sent", sent)
+    metrics.inc("messages_acked", acked)
+    metrics.set(
+        "messages_in_flight",
+        max(0, metrics.get("messages_sent") - metrics.get("messages_acked")),
+    )
+
+
+def stream_properties(userdata, alias: int = 0) -> Properties:
+    # tags every message with this publisher's client id for the subscriber's SeqTracker
+    properties = Properties(PacketTypes.PUBLISH)
+    properties.UserProperty = ("stream", userdata["client_id"])
+    if alias:
+        properties.TopicAlias = alias
+    return properties
+
+
+def alias_topic(userdata, topic: str) -> Tuple[str, Properties]:
+    """Returns the topic and properties to publish to topic with an MQTT v5 topic alias.
+    The first publish to a topic maps it to a new alias, later ones only send the alias.
+    Topics beyond the broker's TopicAliasMaximum are sent in full."""
+    aliases = userdata["topic_aliases"]
+    alias = aliases.get(topic, None)
+    if alias is not None:
+        return "", userdata["alias_props"][alias]
+    if len(aliases) >= userdata["topic_alias_max"]:
+        return topic, userdata["stream_props"]
+    alias = len(aliases) + 1
+    if alias not in userdata["alias_props"]:
+        userdata["alias_props"][alias] = stream_properties(userdata, alias)
+    aliases[topic] = alias
+    return topic, userdata["alias_props"][alias]
+
+
+def publish(userdata, topic: str, payload) -> mqtt.MQTTMessageInfo:
+    if not userdata["topic_alias"]:
+        return client.publish(topic, payload, userdata["qos"], properties=userdata["stream_props"])
+    with userdata["alias_lock"]:
+        topic, properties = alias_topic(userdata, topic)
+        return client.publish(topic, payload, userdata["qos"], properties=properties)
+
+
+def record_publish(userdata, mid: int, cur_time: float, seq_num: int, **extra):
+    data = userdata["data"]
+    userdata["lock"].acquire()
+    if data.get(mid, None) is None:
+        # on_publish() not called yet
+        data[mid] = {
+            "publishing_time": cur_time,
+            "published_time": -1,
+            "time_diff": -1,
+            "seq_num": seq_num,
+            "qos": userdata["qos"],
+            **extra,
+        }
+    else:
+        # on_publish() already called
+        data[mid]["publishing_time"] = cur_time
+        data[mid]["seq_num"] = seq_num
+        data[mid]["qos"] = userdata["qos"]
+        data[mid]["time_diff"] = data[mid]["published_time"] - cur_time
+        data[mid].update(extra)
+        userdata["metrics"].observe("pub_delay", data[mid]["time_diff"])
+    userdata["lock"].release()
+    update_sent_metrics(userdata["metrics"], sent=1)
+
+
+def send_packet(userdata) -> bool:
+    """Publishes the next message. Run by the scheduler every send_interval seconds,
+    returns False once all messages have been sent."""
+    if userdata["curr_seq_num"] > userdata["total_packets"]:
+        return False
+    cur_time: float = get_time()
+    seq_num = userdata["curr_seq_num"]
+
+    topic = userdata["topics"][(seq_num - 1) % len(userdata["topics"])]
+    msg: mqtt.MQTTMessageInfo = publish(userdata, topic, f"{seq_num} {cur_time}")
+
+    # print(msg.rc)
+
+    while msg.rc != mqtt.MQTT_ERR_SUCCESS:
+        print(f"Error publishing message with seq_num {seq_num}: {msg.rc}")
+        print("Retrying...")
+
+        cur_time = get_time()
+        msg = publish(userdata, topic, f"{seq_num} {cur_time}")
+
+    record_publish(userdata, msg.mid, cur_time, seq_num, topic=topic)
+    print(f"Message {msg.mid} with seq num {seq_num} is published")
+    userdata["curr_seq_num"] += 1
+    return userdata["curr_seq_num"] <= userdata["total_packets"]
+
+
+def take_sample(userdata) -> bool:
+    """Takes a sample every send_interval seconds like send_packet(), but coalesces up to batch_size
+    samples into one message. A batch is also sent once its first sample has waited batch_linger ms.
+    Returns False once all samples have been taken and sent."""
+    if userdata["curr_seq_num"] > userdata["total_packets"]:
+        return False
+    batch = userdata["batch"]
+    batch.append((userdata["curr_seq_num"], get_time()))
+    userdata["curr_seq_num"] += 1
+    if len(batch) == 1 and userdata["batch_linger"] > 0:
+        userdata["linger_task"] = userdata["scheduler"].after(
+            "linger", userdata["batch_linger"] / 1000, flush_batch, userdata
         )
+    done = userdata["curr_seq_num"] > userdata["total_packets"]
+    if len(batch) >= userdata["batch_size"] or done:
+        flush_batch(userdata)
+    return not done
+
+
+def flush_batch(userdata):
+    # runs on the scheduler thread like take_sample(), so the batch needs no lock
+    if userdata["linger_task"] is not None:
+        userdata["linger_task"].cancel()
+        userdata["linger_task"] = None
+    if userdata["batch"]:
+        publish_batch(userdata, userdata["batch"])
+        userdata["batch_count"] += 1
+        userdata["batch"] = []
+
+
+def publish_batch(userdata, batch: List[Tuple[int, float]]):
+    # one "<seq_num> <send_time>" line per sample, so a batch of one is an ordinary message
+    seq_num = batch[0][0]
+    topic = userdata["topics"][(seq_num - 1) % len(userdata["topics"])]
+    payload = "\n".join(f"{sample_seq_num} {sample_time}" for sample_seq_num, sample_time in batch)
+    cur_time: float = get_time()
+    msg: mqtt.MQTTMessageInfo = publish(userdata, topic, payload)
+
+    while msg.rc != mqtt.MQTT_ERR_SUCCESS:
+        print(f"Error publishing batch with seq_num {seq_num}: {msg.rc}")
+        print("Retrying...")
+
+        cur_time = get_time()
+        msg = publish(userdata, topic, payload)
+
+    record_publish(
+        userdata, msg.mid, cur_time, seq_num, topic=topic, batch=[list(s) for s in batch]
+    )
+    print(f"Message {msg.mid} with seq nums {seq_num}-{batch[-1][0]} is published")
+
+
+def calc_batch_stats(userdata, list_data, wire):
+    """Per-sample stats of a batched run. linger is the time a sample waited for its batch to be sent,
+    sample_delay the time from the sample being taken until its batch was published."""
+    batches = [pkt for pkt in list_data if "batch" in pkt]
+    samples = [
+        {
+            "sample_time": sample_time,
+            "linger": pkt["publishing_time"] - sample_time,
+            "sample_delay": pkt["published_time"] - sample_time,
+        }
+        for pkt in batches
+        for _, sample_time in pkt["batch"]
+    ]
+    return {
+        "batch_size": userdata["batch_size"],
+        "batch_linger": userdata["batch_linger"],
+        "batches": len(batches),
+        "samples": len(samples),
+        "samples_per_batch": len(samples) / len(batches),
+        "linger": calc_stats(samples, "linger"),
+        "sample_delay": calc_stats(samples, "sample_delay"),
+        "sample_throughput": calc_throughput(
+            len(samples),
+            min(sample["sample_time"] for sample in samples),
+            max(pkt["published_time"] for pkt in batches),
+        ),
+        "bytes_per_sample": (wire["sent"]["wire"] + wire["recv"]["wire"]) / len(samples),
+    }
+
 
-        # print(msg.rc)
+def send_blob(userdata, blob: memoryview, crc: int) -> bool:
+    """Publishes the next copy of blob, split into chunk_size KB messages. Run by the scheduler
+    every send_interval seconds, returns False once total_packets blobs have been sent.
+    Chunks are sliced from the preallocated/memory-mapped blob without copying."""
+    if userdata["curr_seq_num"] > userdata["total_packets"]:
+        return False
+    blob_time: float = get_time()
+    seq_num = userdata["curr_seq_num"]
+    topic = userdata["topics"][(seq_num - 1) % len(userdata["topics"])]
+
+    for chunk_idx, n_chunks, chunk in iter_chunks(blob, userdata["chunk_size"]):
+        cur_time: float = get_time()
+        payload = pack_chunk(seq_num, chunk_idx, n_chunks, len(blob), blob_time, crc, chunk)
+        msg: mqtt.MQTTMessageInfo = publish(userdata, topic, payload)
 
         while msg.rc != mqtt.MQTT_ERR_SUCCESS:
-            print(f"Error publishing message with seq_num {seq_num}: {msg.rc}")
+            print(f"Error publishing chunk {chunk_idx} of blob {seq_num}: {msg.rc}")
             print("Retrying...")
 
             cur_time = get_time()
-            msg = client.publish("test", f"{seq_num} {cur_time}", userdata["qos"])
-
-        userdata["lock"].acquire()
-        if data.get(msg.mid, None) is None:
-            # on_publish() not called yet
-            data[msg.mid] = {
-                "publishing_time": cur_time,
-                "published_time": -1,
-                "time_diff": -1,
-                "seq_num": seq_num,
-                "qos": userdata["qos"],
-            }
-        else:
-            # on_publish() already called
-            data[msg.mid]["publishing_time"] = cur_time
-            data[msg.mid]["seq_num"] = seq_num
-            data[msg.mid]["qos"] = userdata["qos"]
-            data[msg.mid]["time_diff"] = data[msg.mid]["published_time"] - cur_time
-        userdata["lock"].release()
-        print(f"Message {msg.mid} with seq num {seq_num} is published")
-        userdata["curr_seq_num"] += 1
-        time.sleep(1)
+            msg = publish(userdata, topic, payload)
+
+        record_publish(userdata, msg.mid, cur_time, seq_num, topic=topic, chunk=chunk_idx)
+
+    print(f"Blob with seq num {seq_num} is published in {n_chunks} chunks")
+    userdata["curr_seq_num"] += 1
+    return userdata["curr_seq_num"] <= userdata["total_packets"]
+
+
+def load_trace(fname):
+    """Returns a recorded publish timeline as a list of (offset in ms, payload size, topic).
+    fname is either a data/pub JSON file from a previous run, or a CSV file with a header row,
+    a timestamp column in seconds and optional size (in bytes) and topic columns."""
+    if fname.endswith(".csv"):
+        with open(fname, "r", newline="") as trace_f:
+            rows = list(csv.DictReader(trace_f))
+        times = [float(row["timestamp"]) * 1000 for row in rows]
+        sizes = [int(row.get("size") or 0) for row in rows]
+        topics = [row.get("topic") or None for row in rows]
+    else:
+        with open(fname, "r") as trace_f:
+            rows = [
+                pkt
+                for pkt in json.load(trace_f)
+                if pkt["seq_num"] != -1 and pkt["publishing_time"] != -1
+            ]
+        times = [pkt["publishing_time"] for pkt in rows]
+        sizes = [0] * len(rows)
+        topics = [pkt.get("topic", None) for pkt in rows]
+
+    if not times:
+        raise ValueError(f"{fname} has no publishes to replay")
+    start = min(times)
+    return sorted(
+        zip([t - start for t in times], sizes, topics), key=lambda entry: entry[0]
+    )
+
+
+def replay_packets(userdata, trace) -> threading.Event:
+    """Replays the publishes in trace at replay_speed times their original rate.
+    Every publish is scheduled against an absolute deadline from the start of the replay,
+    so that lateness of one publish does not shift the ones after it. Only the next publish
+    is scheduled at any time, so that a long trace does not fill up the scheduler before it starts.
+    Returns an event that is set once the last publish has been issued."""
+    userdata["replay_start"] = time.monotonic()
+    userdata["replay_entries"] = iter(trace)
+    userdata["replay_done"] = threading.Event()
+    schedule_replay(userdata)
+    return userdata["replay_done"]
+
+
+def schedule_replay(userdata):
+    entry = next(userdata["replay_entries"], None)
+    if entry is None:
+        userdata["replay_done"].set()
+        return
+    offset, size, topic = entry
+    deadline = userdata["replay_start"] + offset / 1000 / userdata["replay_speed"]
+    userdata["scheduler"].at("replay", deadline, replay_packet, userdata, deadline, offset, size, topic)
+
+
+def replay_packet(userdata, deadline: float, offset: float, size: int, topic: str):
+    lateness = (time.monotonic() - deadline) * 1000
+    seq_num = userdata["curr_seq_num"]
+    topic = topic or userdata["topics"][(seq_num - 1) % len(userdata["topics"])]
+
+    cur_time: float = get_time()
+    payload = f"{seq_num} {cur_time}"
+    if size > len(payload) + 1:
+        payload += " " + "x" * (size - len(payload) - 1)
+    msg: mqtt.MQTTMessageInfo = publish(userdata, topic, payload)
+
+    while msg.rc != mqtt.MQTT_ERR_SUCCESS:
+        print(f"Error publishing message with seq_num {seq_num}: {msg.rc}")
+        print("Retrying...")
+
+        cur_time = get_time()
+        msg = publish(userdata, topic, payload)
+
+    # no per-message print here, it would add to the lateness of bursts
+    record_publish(
+        userdata,
+        msg.mid,
+        cur_time,
+        seq_num,
+        topic=topic,
+        trace_offset=offset,
+        lateness=lateness,
+    )
+    userdata["curr_seq_num"] += 1
+    if userdata["curr_seq_num"] > userdata["total_packets"]:
+        print(f"Replayed {userdata['total_packets']} messages")
+    schedule_replay(userdata)
 
 
 if __name__ == "__main__":
@@ -145,29 +444,81 @@ if __name__ == "__main__":
         "conn_time": -1,
         "conn_tries": 0,
         "conn_data": conn_data,
+        "blob": False,
+        "blob_size": 1024,
+        "chunk_size": 0,
+        "blob_file": "",
+        "topic_root": "test",
+        "topic_depth": 0,
+        "topic_fanout": 1,
+        "send_interval": 1.0,
+        "hostname": hostname,
+        "port": 0,
+        "transport": transport,
+        "metrics_port": 0,
+        "metrics_file": "",
+        "metrics_interval": 5,
+        "replay_file": "",
+        "replay_speed": 1,
+        "tls_resume": False,
+        "ca_certs": "",
+        "profile": False,
+        "profile_interval": 0.005,
+        "resources": False,
+        "resource_interval": 1.0,
+        "batch_size": 1,
+        "batch_linger": 0,
+        "topic_alias": False,
+        "topic_alias_max": 0,
+        "topic_aliases": {},  # Dict[str, int], topic -> alias on the current connection
+        "alias_props": {},  # Dict[int, Properties], one per alias
+        "alias_lock": threading.Lock(),
+        "client_id": "test-pub",
+        "scheduler_spin": 0.001,
+        "batch": [],  # List[Tuple[int, float]], samples of the batch being filled
+        "batch_count": 0,
+        "linger_task": None,  # Optional[Task]
     }
     sent: List[bool] = [False] * userdata["total_packets"]
 
     userdata = parse_yaml(args.file, userdata, "publisher")
     print(f"userdata: {userdata}")
+    # runs the publishing and all other periodic work of the client
+    scheduler = Scheduler(userdata["scheduler_spin"])
+    scheduler.start()
+    userdata["scheduler"] = scheduler
+    userdata["metrics"] = start_metrics(userdata, "pub")
+    userdata["stream_props"] = stream_properties(userdata)
+    userdata["topics"] = generate_topics(
+        userdata["topic_root"], userdata["topic_depth"], userdata["topic_fanout"]
+    )
 
-    client = mqtt.Client(
-        client_id="test-pub",
+    client = InstrumentedClient(
+        client_id=userdata["client_id"],
         userdata=userdata,
         protocol=mqtt.MQTTv5,
-        transport=transport,
+        transport=paho_transport(userdata),
     )
     client.username_pw_set("test", "test")
     if userdata["tls"]:
-        client.tls_set()
+        client.tls_set_context(
+            ResumableSSLContext(userdata["tls_resume"], userdata["ca_certs"])
+        )
 
     client.on_connect = on_connect
+    client.on_disconnect = on_disconnect
     client.on_publish = on_publish
     client.on_log = on_log
 
     # connect to host
     properties = Properties(PacketTypes.CONNECT)
     properties.SessionExpiryInterval = 30
+    profiler = Profiler(userdata["profile_interval"]) if userdata["profile"] else None
+    if profiler:
+        profiler.start()
+    sampler = ResourceSampler(userdata["resource_interval"]) if userdata["resources"] else None
+    if sampler:
+        sampler.start(scheduler)
     connect_to_broker(client, userdata, properties)
 
     start_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -178,17 +529,58 @@ if __name__ == "__main__":
     while not userdata["connected"]:
         pass
 
-    send_packets(userdata)
+    if userdata["replay_file"]:
+        trace = load_trace(userdata["replay_file"])
+        userdata["total_packets"] = len(trace)
+        expected_count = len(trace)
+        replay_packets(userdata, trace).wait()
+    elif userdata["blob"]:
+        blob = load_blob(userdata["blob_size"], userdata["blob_file"])
+        n_chunks = sum(1 for _ in iter_chunks(blob, userdata["chunk_size"]))
+        expected_count = userdata["total_packets"] * n_chunks
+        scheduler.every(
+            "publish",
+            userdata["send_interval"],
+            send_blob,
+            userdata,
+            blob,
+            blob_crc(blob),
+            delay=0,
+            skip_missed=False,
+        ).wait()
+    elif userdata["batch_size"] > 1:
+        scheduler.every(
+            "sample", userdata["send_interval"], take_sample, userdata, delay=0, skip_missed=False
+        ).wait()
+        expected_count = userdata["batch_count"]
+    else:
+        expected_count = userdata["total_packets"]
+        scheduler.every(
+            "publish", userdata["send_interval"], send_packet, userdata, delay=0, skip_missed=False
+        ).wait()
 
-    while userdata["published_count"] < userdata["total_packets"]:
+    while userdata["published_count"] < expected_count:
         time.sleep(1)
+    scheduler.stop()
+    userdata["metrics"].stop()
+    if profiler:
+        profiler.stop()
+    if sampler:
+        sampler.stop()
 
     cur_date = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    if profiler:
+        profile_fnames = profiler.dump(get_data_fname("pub-profile", cur_date, userdata, ""))
+    if sampler:
+        resources_fname = dump_data("pub-resources", sampler.dump(), cur_date, userdata)
     if conn_data:
         conn_data_fname = dump_data("pub-conn", conn_data, cur_date, userdata)
         conn_delay_stats = calc_stats(conn_data)
         conn_tries_stats = calc_stats(conn_data, "tries")
+        conn_phase_stats = calc_conn_phase_stats(conn_data)
     if data:
+        for mid, pkt in data.items():
+            pkt.update(calc_stage_durations(client.stage_times.get(mid, {})))
         list_data = list(data.values())
         data_fname = dump_data("pub", list_data, cur_date, userdata)
         pub_delay_stats = calc_stats(list_data)
@@ -206,19 +598,64 @@ if __name__ == "__main__":
         if not os.path.isdir(stats_folder):
             os.mkdir(stats_folder)
 
+        # published_count counts messages, which are chunks in blob mode and batches in batch mode
+        wire_stats = calc_wire_stats(
+            client.byte_totals(), userdata["transport"], userdata["total_packets"]
+        )
         with open(stats_fname, "w") as stats_f:
             summary_data = {
                 "start_time": start_time,
                 "label": userdata["label"],
                 "pub_data_file": data_fname,
                 "tls": userdata["tls"],
+                "transport": userdata["transport"],
                 "qos": userdata["qos"],
                 "pkt_sent": userdata["total_packets"],
+                "throughput": calc_throughput(
+                    len(list_data),
+                    min(pkt["publishing_time"] for pkt in list_data),
+                    max(pkt["published_time"] for pkt in list_data),
+                ),
+                "topic_count": len(userdata["topics"]),
                 "pub_delay": pub_delay_stats,
+                "pub_stages": calc_stage_stats(list_data),
+                "wire": wire_stats,
             }
             if conn_data:
                 summary_data["conn_delay"] = conn_delay_stats
                 summary_data["conn_tries"] = conn_tries_stats
+                summary_data["conn_phases"] = conn_phase_stats
                 summary_data["conn_data_file"] = conn_data_fname
+            summary_data["scheduler"] = scheduler.summary()
+            if profiler:
+                summary_data["profile"] = profiler.summary(profile_fnames)
+            if sampler:
+                summary_data["resources"] = sampler.summary(resources_fname)
+            if userdata["topic_alias"]:
+                summary_data["topic_alias"] = {
+                    "alias_max": userdata["topic_alias_max"],
+                    "aliases": len(userdata["topic_aliases"]),
+                }
+            if userdata["replay_file"]:
+                replay_duration = max(pkt["publishing_time"] for pkt in list_data) - min(
+                    pkt["publishing_time"] for pkt in list_data
+                )
+                summary_data["replay"] = {
+                    "file": userdata["replay_file"],
+                    "speed": userdata["replay_speed"],
+                    "lateness": calc_stats(list_data, "lateness"),
+                    "trace_duration": trace[-1][0] / userdata["replay_speed"],
+                    "replay_duration": replay_duration,
+                }
+            elif userdata["blob"]:
+                summary_data["blob_size"] = len(blob)
+                summary_data["chunks_per_blob"] = n_chunks
+                summary_data["goodput_MBps"] = goodput(
+                    len(blob) * userdata["total_packets"],
+                    min(pkt["publishing_time"] for pkt in list_data),
+                    max(pkt["published_time"] for pkt in list_data),
+                )
+            elif userdata["batch_size"] > 1:
+                summary_data["batching"] = calc_batch_stats(userdata, list_data, wire_stats)
 
             json.dump({"publisher": summary_data}, stats_f)
@@ -0,0 +1,41 @@
+#!/usr/bin/env bash
+
+# Runs a small-payload workload unbatched and with growing batch sizes, with and without topic aliases.
+# Summaries are labelled batch<N>[_alias] and can be compared against batch1 with plotting-scripts/batch-report.py
+# Topic aliases need a broker that allows them (eg. mosquitto, which allows 10 by default)
+scenarioDir="batching-scenarios"
+qos=${1:-0}
+mkdir -p $scenarioDir
+
+for batch in "1:0" "10:50" "100:500"; do
+    batch_size=${batch%%:*}
+    linger=${batch##*:}
+    for alias in "False" "True"; do
+        label="batch${batch_size}$([ "$alias" = "True" ] && echo "_alias")"
+        yaml_file="$scenarioDir/$label.yaml"
+        cat > "$yaml_file" <<YAML
+shared:
+  qos: $qos
+  label: $label
+  total_packets: 2000
+  tls: False
+  topic_root: site
+  topic_depth: 1
+  topic_fanout: 10
+publisher:
+  send_interval: 0.005
+  batch_size: $batch_size
+  batch_linger: $linger
+  topic_alias: $alias
+subscriber:
+YAML
+        echo "## Going to run Scenario: $yaml_file"
+        screen -S sub-screen -d -m python3 sub-client.py -f "$yaml_file"
+        sleep 5
+        python3 pub-client.py -f "$yaml_file"
+        echo "## Pub-Client Finished.. Waiting for a while"
+        sleep 5
+        screen -S sub-screen -p 0 -X stuff $'\003'
+        sleep 5
+    done
+done
@@ -0,0 +1,44 @@
+#!/usr/bin/env bash
+
+# Runs a consumer group of K subscribers sharing one subscription ($share/<group>/<topic>),
+# first with stable members and then with members that get disconnected.
+# The summaries of the members are merged by group-summary.py under the labels group<K> and group<K>_disconnect
+# Shared subscriptions need an MQTT v5 broker that supports them (eg. mosquitto)
+scenarioDir="group-scenarios"
+members=${1:-3}
+qos=${2:-1}
+mkdir -p $scenarioDir
+
+for disconnect_perc in "0" "0.5"; do
+    label="group${members}$([ "$disconnect_perc" != "0" ] && echo "_disconnect")"
+    yaml_file="$scenarioDir/$label.yaml"
+    cat > "$yaml_file" <<YAML
+shared:
+  qos: $qos
+  label: $label
+  total_packets: 1000
+  tls: False
+publisher:
+  send_interval: 0.02
+subscriber:
+  share_group: bench
+  disconnect_perc: $disconnect_perc
+  disconnect_interval: 5
+  disconnect_duration: 2
+YAML
+    echo "## Going to run Scenario: $yaml_file"
+    for i in $(seq 1 "$members"); do
+        screen -S "sub-screen-$i" -d -m python3 sub-client.py -f "$yaml_file" -i "test-sub-$i"
+    done
+    sleep 5
+    python3 pub-client.py -f "$yaml_file"
+    echo "## Pub-Client Finished.. Waiting for a while"
+    sleep 5
+    for i in $(seq 1 "$members"); do
+        screen -S "sub-screen-$i" -p 0 -X stuff $'\003'
+    done
+    # give the members time to write their summaries
+    sleep 10
+    python3 group-summary.py -f "$yaml_file"
+    sleep 5
+done
@@ -0,0 +1,50 @@
+#!/usr/bin/env bash
+
+# Compares full and resumed TLS handshakes under a reconnect storm:
+# N subscribers (10 by default) with their own client ids are each disconnected every half second and reconnect
+# immediately, with and without session resumption. They share a subscription so that each writes its own summary,
+# and group-summary.py merges their connect phase stats into conn_phases in the summaries labelled tls_full and tls_resumed.
+# The broker is expected to use the MQTT over TLS listener of mosquitto-tls.conf, with a certificate for hostname from gen-certs.sh.
+scenarioDir="tls-scenarios"
+caCerts=${1:-certs/ca.crt}
+members=${2:-10}
+hostname=${3:-localhost}
+mkdir -p $scenarioDir
+
+for resume in False True; do
+    label=$([[ $resume == True ]] && echo "tls_resumed" || echo "tls_full")
+    yaml_file="$scenarioDir/$label.yaml"
+    cat > "$yaml_file" <<YAML
+shared:
+  qos: 1
+  label: $label
+  total_packets: 100
+  hostname: $hostname
+  transport: tls
+  port: 8883
+  tls_resume: $resume
+  ca_certs: $caCerts
+publisher:
+  send_interval: 0.2
+subscriber:
+  share_group: $label
+  disconnect_perc: 1
+  disconnect_interval: 0.5
+  disconnect_duration: 0
+YAML
+    echo "## Going to run Scenario: $yaml_file"
+    for i in $(seq 1 "$members"); do
+        screen -S "sub-screen-$i" -d -m python3 sub-client.py -f "$yaml_file" -i "test-sub-$i"
+    done
+    sleep 10
+    python3 pub-client.py -f "$yaml_file"
+    echo "## Pub-Client Finished.. Waiting for a while"
+    sleep 10
+    for i in $(seq 1 "$members"); do
+        screen -S "sub-screen-$i" -p 0 -X stuff $'\003'
+    done
+    # give the members time to write their summaries
+    sleep 10
+    python3 group-summary.py -f "$yaml_file"
+    sleep 5
+done
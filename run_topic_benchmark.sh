@@ -0,0 +1,57 @@
+#!/usr/bin/env bash
+
+# Runs the same workload across growing topic trees and subscription counts.
+# Each run writes its summary with label topics<N>_subs<M>, which can be plotted with plotting-scripts/mean-plotter.py
+# M is the number of filters actually subscribed to, as generate_filters() drops filters that would overlap
+# Loss is only counted over the topics that the filters match, and single filters on large trees need long runs
+scenarioDir="topic-scenarios"
+qos=${1:-0}
+mkdir -p $scenarioDir
+
+# depth:fanout pairs -> 1, 10, 100, 1000 topics
+for tree in "0:1" "1:10" "2:10" "3:10"; do
+    depth=${tree%%:*}
+    fanout=${tree##*:}
+    topics=$((fanout ** depth))
+    ran=""
+    # exact:plus:hash filter mixes
+    for filters in "1:0:0" "10:5:1" "100:50:10"; do
+        IFS=":" read -r exact plus hash <<< "$filters"
+        # prints the number of filters and of topics they match
+        read -r subs matched <<< "$(python3 -c "from util import generate_topics, generate_filters, subscribed_seq_nums
+topics = generate_topics('site', $depth, $fanout)
+filters = generate_filters(topics, 'site', $exact, $plus, $hash)
+print(len(filters), len(subscribed_seq_nums(topics, filters, len(topics)) or topics))")"
+        # every topic gets at least 2 messages, and the subscribed topics at least 100 between them
+        per_topic=$(((100 + matched - 1) / matched > 2 ? (100 + matched - 1) / matched : 2))
+        total_packets=$((topics * per_topic))
+        # small trees can end up with the same filters for several mixes
+        [[ " $ran " == *" $subs "* ]] && continue
+        ran="$ran $subs"
+        yaml_file="$scenarioDir/topics${topics}_subs${subs}.yaml"
+        cat > "$yaml_file" <<YAML
+shared:
+  qos: $qos
+  label: topics${topics}_subs${subs}
+  total_packets: $total_packets
+  tls: False
+  topic_root: site
+  topic_depth: $depth
+  topic_fanout: $fanout
+publisher:
+  send_interval: 0.01
+subscriber:
+  sub_exact: $exact
+  sub_plus: $plus
+  sub_hash: $hash
+YAML
+        echo "## Going to run Scenario: $yaml_file"
+        screen -S sub-screen -d -m python3 sub-client.py -f "$yaml_file"
+        sleep 10
+        python3 pub-client.py -f "$yaml_file"
+        echo "## Pub-Client Finished.. Waiting for a while"
+        sleep 10
+        screen -S sub-screen -p 0 -X stuff $'\003'
+        sleep 10
+    done
+done
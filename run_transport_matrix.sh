@@ -0,0 +1,37 @@
+#!/usr/bin/env bash
+
+# Runs the same workload over tcp, ws, tls and wss against a local broker started with
+#   mosquitto -c mosquitto-matrix.conf
+# The publisher sends back to back (send_interval: 0), so that throughput is limited by the transport
+# rather than by the offered rate
+# Summaries are labelled transport_<transport> and can be compared with plotting-scripts/transport-report.py
+scenarioDir="transport-scenarios"
+qos=${1:-0}
+mkdir -p $scenarioDir
+
+for transport in "tcp:1883" "ws:8080" "tls:8883" "wss:8443"; do
+    name=${transport%%:*}
+    port=${transport##*:}
+    yaml_file="$scenarioDir/transport_$name.yaml"
+    cat > "$yaml_file" <<YAML
+shared:
+  qos: $qos
+  label: transport_$name
+  total_packets: 10000
+  hostname: localhost
+  transport: $name
+  port: $port
+  ca_certs: certs/ca.crt
+publisher:
+  send_interval: 0
+subscriber:
+YAML
+    echo "## Going to run Scenario: $yaml_file"
+    screen -S sub-screen -d -m python3 sub-client.py -f "$yaml_file"
+    sleep 5
+    python3 pub-client.py -f "$yaml_file"
+    echo "## Pub-Client Finished.. Waiting for a while"
+    sleep 5
+    screen -S sub-screen -p 0 -X stuff $'\003'
+    sleep 5
+done
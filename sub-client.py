@@ -10,7 +10,8 @@ import argparse
 import random
 import threading
 import os
-from typing import Any, List, Dict
+import queue
+from typing import Any, List, Dict, Optional, Tuple
 
 from util import (
     dump_data,
@@ -18,30 +19,54 @@ from util import (
     get_time,
     record_connect,
     connect_to_broker,
-    transport,
     parse_yaml,
+    paho_transport,
+    hostname,
+    transport,
+    calc_conn_phase_stats,
+    calc_throughput,
+    generate_topics,
+    generate_filters,
+    subscribed_seq_nums,
+    get_data_fname,
 )
+from Metrics import start_metrics
+from Profiler import Profiler
+from ResourceSampler import ResourceSampler
+from Scheduler import Scheduler
+from SeqTracker import SeqTracker
+from InstrumentedClient import (
+    InstrumentedClient,
+    ResumableSSLContext,
+    calc_connect_durations,
+    calc_wire_stats,
+)
+from blob import BlobAssembler, goodput
 
 
 def periodic_disconnect(client: mqtt.Client, userdata: Dict[str, Any]):
-    """Periodically disconnects the client based on the specified disconnect_perc. Ends on KeyboardInterrupt."""
-    while not userdata["disconnect_event"].is_set():
-        time.sleep(userdata["disconnect_interval"])
-        n: float = random.uniform(0, 1)
-        if n <= userdata["disconnect_perc"]:
-            client.disconnect()
-            userdata["e2e_data"].append(
-                {
-                    "seq_num": -1,
-                    "last_seq_num": userdata["e2e_data"][-1]["seq_num"]
-                    if len(userdata["e2e_data"]) > 0
-                    else -1,
-                    "disconnect_time": get_time(),
-                    "reconnect_time": -1,
-                }
-            )
-            # wait for reconnect before starting next interval
-            time.sleep(userdata["disconnect_duration"])
+    """Disconnects the client with a chance of disconnect_perc, and schedules the next try
+    disconnect_interval seconds later. Ends when the scheduler is stopped on KeyboardInterrupt.
+    A client that has not reconnected from the previous disconnect yet is left alone."""
+    delay = userdata["disconnect_interval"]
+    n: float = random.uniform(0, 1)
+    if n <= userdata["disconnect_perc"] and client.is_connected():
+        # added before disconnecting, as the main thread sets its reconnect_time once it has reconnected
+        userdata["last_disconnect"] = {
+            "seq_num": -1,
+            "last_seq_num": userdata["e2e_data"][-1]["seq_num"]
+            if len(userdata["e2e_data"]) > 0
+            else -1,
+            "disconnect_time": get_time(),
+            "reconnect_time": -1,
+        }
+        userdata["e2e_data"].append(userdata["last_disconnect"])
+        client.disconnect()
+        # wait for reconnect before starting next interval
+        delay += userdata["disconnect_duration"]
+    userdata["disconnect_task"] = userdata["scheduler"].after(
+        "disconnect", delay, periodic_disconnect, client, userdata
+    )
 
 
 def on_connect(
@@ -52,39 +77,249 @@ def on_connect(
     properties: Properties,
 ):
     """Callback for when client receives a CONNACK response from broker"""
-    record_connect(userdata)
+    record_connect(userdata, calc_connect_durations(client.connect_phases))
     print("Connected with reason code " + reason.getName())
 
     # Subscribing in on_connect() means that if we lose the connection and
     # reconnect then subscriptions will be renewed.
-    client.subscribe("test", qos=userdata["qos"])
+    if userdata["share_group"] and not getattr(properties, "SharedSubscriptionAvailable", 1):
+        print("Broker does not support shared subscriptions")
+    client.subscribe([(f, userdata["qos"]) for f in userdata["topic_filters"]])
 
-    # Create and start disconnect thread only if:
+    # Schedule disconnects only if:
     #   We want disconnections to happen (ie. disconnect_perc > 0)
-    #   Thread has not already been created and started
-    if userdata["disconnect_thread"] is None and userdata["disconnect_perc"] > 0:
-        userdata["disconnect_event"] = threading.Event()
-        userdata["disconnect_thread"] = threading.Thread(
-            target=periodic_disconnect, args=[client, userdata]
+    #   They have not already been scheduled
+    if userdata["disconnect_task"] is None and userdata["disconnect_perc"] > 0:
+        userdata["disconnect_task"] = userdata["scheduler"].after(
+            "disconnect", userdata["disconnect_interval"], periodic_disconnect, client, userdata
         )
-        userdata["disconnect_thread"].start()
 
 
 def on_message(client: mqtt.Client, userdata: Dict[str, Any], msg: mqtt.MQTTMessage):
-    """Callback for when a PUBLISH message is received from the server"""
+    """Callback for when a PUBLISH message is received from the server.
+    Sequence numbers are tracked here, so that reordering is counted in the order messages arrived.
+    With workers set, the message is then only queued so that processing does not hold up
+    the network thread."""
     rcv_time: float = get_time()
+    userdata["metrics"].inc("messages_received")
+    if userdata["blob"]:
+        received = receive_blob_chunk(userdata, msg, rcv_time)
+    else:
+        received = receive_samples(userdata, msg)
+    if received is None:
+        return
+    if userdata["workers"]:
+        enqueue_message(userdata, msg, rcv_time, received)
+    else:
+        timed_process_message(userdata, msg, rcv_time, received)
+
+
+def enqueue_message(userdata: Dict[str, Any], msg: mqtt.MQTTMessage, rcv_time: float, received: Any):
+    """Adds a message to the worker queue, applying the backpressure policy if the queue is full"""
+    msg_queue: queue.Queue = userdata["queue"]
+    if userdata["backpressure"] == "block":
+        # stops reading from the socket until a worker frees up space, like a slow consumer would
+        msg_queue.put((msg, rcv_time, received))
+    else:
+        while True:
+            try:
+                msg_queue.put_nowait((msg, rcv_time, received))
+                break
+            except queue.Full:
+                userdata["metrics"].inc("messages_dropped")
+                if userdata["backpressure"] == "drop_newest":
+                    userdata["samples_dropped"] += count_new(userdata, received)
+                    return
+                try:
+                    _, _, oldest = msg_queue.get_nowait()
+                    userdata["samples_dropped"] += count_new(userdata, oldest)
+                except queue.Empty:
+                    pass
+    depth = msg_queue.qsize()
+    userdata["max_queue_depth"] = max(userdata["max_queue_depth"], depth)
+    userdata["metrics"].set("queue_depth", depth)
+
+
+def count_new(userdata: Dict[str, Any], received: Any) -> int:
+    """Number of samples (or blobs) in a queued message that were not duplicates. These were already
+    counted as received by their SeqTracker, so when the message is dropped they are reported as
+    samples_dropped instead."""
+    if userdata["blob"]:
+        return 0 if received["dup"] else 1
+    return sum(not dup for _, _, dup in received)
+
+
+def process_worker(userdata: Dict[str, Any]):
+    """Takes up to worker_batch messages off the queue at a time and processes them.
+    Ends on None."""
+    msg_queue: queue.Queue = userdata["queue"]
+    while True:
+        items = [msg_queue.get()]
+        # stop at None so that every worker gets its own
+        while items[-1] is not None and len(items) < userdata["worker_batch"]:
+            try:
+                items.append(msg_queue.get_nowait())
+            except queue.Empty:
+                break
+        dequeue_time = get_time()
+        for item in items:
+            if item is None:
+                return
+            msg, rcv_time, received = item
+            timed_process_message(userdata, msg, rcv_time, received, dequeue_time)
+
+
+def timed_process_message(
+    userdata: Dict[str, Any],
+    msg: mqtt.MQTTMessage,
+    rcv_time: float,
+    received: Any,
+    dequeue_time: float = -1,
+):
+    """Processes msg and adds the time it spent queued and being processed to its records"""
+    start = time.perf_counter()
+    records = process_message(userdata, msg, rcv_time, received)
+    if userdata["process_delay"]:
+        # simulated per-message work of a slow consumer
+        time.sleep(userdata["process_delay"] / 1000)
+    process_time = (time.perf_counter() - start) * 1000
+    userdata["metrics"].observe("process_time", process_time)
+    if dequeue_time != -1:
+        userdata["metrics"].observe("queue_time", dequeue_time - rcv_time)
+    for record in records:
+        record["process_time"] = process_time
+        if dequeue_time != -1:
+            record["dequeue_time"] = dequeue_time
+            record["queue_time"] = dequeue_time - rcv_time
+
+
+def receive_samples(
+    userdata: Dict[str, Any], msg: mqtt.MQTTMessage
+) -> Optional[List[Tuple[int, float, bool]]]:
+    """Returns (seq_num, send_time, dup) of every sample in msg, or None if msg is not for this run.
+    Batched messages carry one sample per line."""
+    root = userdata["topic_root"]
+    if msg.topic != root and not msg.topic.startswith(root + "/"):
+        return None
+    received = []
+    for sample in msg.payload.split(b"\n"):
+        # replayed messages may be padded with a third field to match the traced size
+        seq_num, send_time = sample.split(b" ")[:2]
+        received.append((int(seq_num), float(send_time), not track_seq(userdata, msg, int(seq_num))))
+    return received
+
+
+def process_message(
+    userdata: Dict[str, Any], msg: mqtt.MQTTMessage, rcv_time: float, received: Any
+) -> List[Dict[str, Any]]:
+    """Records the samples (or blob) received in msg. Returns the records added to e2e_data."""
+    if userdata["blob"]:
+        return record_blob(userdata, received)
+    records = []
     print(f"{msg.topic} {msg.payload} {msg.mid}")
-    if msg.topic == "test":
-        content: str = msg.payload.decode()
-        seq_num, send_time = content.split(" ")
+    for seq_num, send_time, dup in received:
         pkt_data: Dict[str, Any] = {
-            "seq_num": int(seq_num),
-            "send_time": float(send_time),
+            "seq_num": seq_num,
+            "send_time": send_time,
             "rcv_time": rcv_time,
-            "time_diff": (rcv_time - float(send_time)),
+            "time_diff": (rcv_time - send_time),
             "qos": msg.qos,
+            "topic": msg.topic,
+            "dup": dup,
         }
+        if len(received) > 1:
+            pkt_data["batch_size"] = len(received)
         userdata["e2e_data"].append(pkt_data)
+        userdata["metrics"].observe("e2e_delay", pkt_data["time_diff"])
+        records.append(pkt_data)
+    return records
+
+
+def track_seq(userdata: Dict[str, Any], msg: mqtt.MQTTMessage, seq_num: int) -> bool:
+    """Adds seq_num to the SeqTracker of the publisher stream that msg belongs to.
+    Returns False if the message is a duplicate."""
+    stream = dict(getattr(msg.properties, "UserProperty", [])).get("stream", "default")
+    with userdata["lock"]:
+        tracker = userdata["seq_trackers"].get(stream, None)
+        if tracker is None:
+            tracker = SeqTracker()
+            userdata["seq_trackers"][stream] = tracker
+        is_new = tracker.add(seq_num)
+    if not is_new:
+        userdata["metrics"].inc("duplicates")
+    return is_new
+
+
+def receive_blob_chunk(
+    userdata: Dict[str, Any], msg: mqtt.MQTTMessage, rcv_time: float
+) -> Optional[Dict[str, Any]]:
+    """Reassembles blob chunks. Returns the record of a blob once it has been received in full
+    and passed its checksum."""
+    assembler: BlobAssembler = userdata["assembler"]
+    with userdata["lock"]:
+        duplicates = assembler.duplicates
+        blob_data = assembler.add(msg.payload, rcv_time)
+        is_dup = assembler.duplicates > duplicates
+    if is_dup:
+        # the blob is only tracked by its SeqTracker once it is complete
+        userdata["metrics"].inc("duplicates")
+    if blob_data is None:
+        return None
+    print(
+        f"Blob {blob_data['seq_num']} received ({blob_data['size']} bytes, crc_ok={blob_data['crc_ok']})"
+    )
+    if not blob_data["crc_ok"]:
+        userdata["blob_corrupt"] += 1
+        userdata["metrics"].inc("blobs_corrupt")
+        return None
+    blob_data["qos"] = msg.qos
+    blob_data["dup"] = not track_seq(userdata, msg, blob_data["seq_num"])
+    return blob_data
+
+
+def record_blob(userdata: Dict[str, Any], blob_data: Dict[str, Any]) -> List[Dict[str, Any]]:
+    userdata["e2e_data"].append(blob_data)
+    userdata["metrics"].inc("blobs_received")
+    userdata["metrics"].observe("e2e_delay", blob_data["time_diff"])
+    return [blob_data]
+
+
+def calc_queue_stats(userdata: Dict[str, Any], e2e_data: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Stats of the worker queue. queue_time is the time a message waited in the queue,
+    process_time the time a worker took to process it."""
+    queued = [pkt for pkt in e2e_data if "queue_time" in pkt]
+    return {
+        "workers": userdata["workers"],
+        "worker_batch": userdata["worker_batch"],
+        "queue_size": userdata["queue_size"],
+        "backpressure": userdata["backpressure"],
+        "process_delay": userdata["process_delay"],
+        "dropped": userdata["metrics"].get("messages_dropped"),
+        "dropped_samples": userdata["samples_dropped"],
+        "max_depth": userdata["max_queue_depth"],
+        "queue_time": calc_stats(queued, "queue_time"),
+        "process_time": calc_stats(queued, "process_time"),
+    }
+
+
+def dump_member_summary(summary_data: Dict[str, Any], userdata: Dict[str, Any]):
+    """Writes the summary of one member of a consumer group to summary/<share_group>/"""
+    stats_folder = f"summary/{userdata['share_group']}/"
+    if not os.path.isdir(stats_folder):
+        os.makedirs(stats_folder)
+    stats_fname = (
+        stats_folder
+        + "_qos"
+        + str(userdata["qos"])
+        + "_"
+        + userdata["label"]
+        + ("_tls" if userdata["tls"] else "")
+        + "_"
+        + userdata["client_id"]
+        + ".json"
+    )
+    with open(stats_fname, "w") as stats_f:
+        json.dump({"subscriber": summary_data}, stats_f)
 
 
 def on_log(client, userdata, level, buf):
@@ -106,6 +341,13 @@ if __name__ == "__main__":
         required=False,
         default="",
     )
+    parser.add_argument(
+        "-i",
+        "--client-id",
+        help="Client id, overrides client_id in the input file (eg. for consumer group members)",
+        required=False,
+        default="",
+    )
     args = parser.parse_args()
 
     # Initialise userdata to be passed to client callbacks
@@ -123,23 +365,96 @@ if __name__ == "__main__":
         "disconnect_perc": 0,
         "disconnect_interval": 10,
         "disconnect_duration": 10,
-        "disconnect_event": None,  # Optional[threading.Event]
-        "disconnect_thread": None,  # Optional[threading.Thread]
+        "disconnect_task": None,  # Optional[Task]
+        "last_disconnect": None,  # Optional[Dict[str, Any]], the marker of the latest disconnect in e2e_data
+        "blob": False,
+        "assembler": BlobAssembler(),
+        "blob_corrupt": 0,
+        "topic_root": "test",
+        "topic_depth": 0,
+        "topic_fanout": 1,
+        "topic_filters": [],
+        "sub_exact": 0,
+        "sub_plus": 0,
+        "sub_hash": 0,
+        "hostname": hostname,
+        "port": 0,
+        "transport": transport,
+        "metrics_port": 0,
+        "metrics_file": "",
+        "metrics_interval": 5,
+        "seq_trackers": {},  # Dict[str, SeqTracker], one per publisher stream
+        "expected_seq_nums": None,  # Optional[List[int]], set if the filters leave out some topics
+        "tls_resume": False,
+        "ca_certs": "",
+        "profile": False,
+        "profile_interval": 0.005,
+        "resources": False,
+        "resource_interval": 1.0,
+        "client_id": "test-sub",
+        "share_group": "",
+        "workers": 0,
+        "worker_batch": 1,
+        "queue_size": 1000,
+        "backpressure": "block",
+        "process_delay": 0,
+        "lock": threading.Lock(),
+        "max_queue_depth": 0,
+        "samples_dropped": 0,
+        "scheduler_spin": 0.001,
     }
     userdata = parse_yaml(args.file, userdata, "subscriber")
+    if args.client_id:
+        userdata["client_id"] = args.client_id
     print(f"userdata: {userdata}")
+    userdata["topics"] = generate_topics(
+        userdata["topic_root"], userdata["topic_depth"], userdata["topic_fanout"]
+    )
+    userdata["topic_filters"] = userdata["topic_filters"] or generate_filters(
+        userdata["topics"],
+        userdata["topic_root"],
+        userdata["sub_exact"],
+        userdata["sub_plus"],
+        userdata["sub_hash"],
+    )
+    # loss only counts the messages sent to topics that the filters match
+    userdata["expected_seq_nums"] = subscribed_seq_nums(
+        userdata["topics"], userdata["topic_filters"], userdata["total_packets"]
+    )
+    if userdata["share_group"]:
+        # the broker hands each message to one member of the group
+        userdata["topic_filters"] = [
+            f"$share/{userdata['share_group']}/{topic_filter}"
+            for topic_filter in userdata["topic_filters"]
+        ]
+    # runs the fault injection and all other periodic work of the client
+    scheduler = Scheduler(userdata["scheduler_spin"])
+    scheduler.start()
+    userdata["scheduler"] = scheduler
+    userdata["metrics"] = start_metrics(userdata, "sub")
+    if userdata["backpressure"] not in ("block", "drop_newest", "drop_oldest"):
+        raise ValueError(f"Unknown backpressure policy {userdata['backpressure']}")
+    userdata["queue"] = queue.Queue(userdata["queue_size"])
+    workers = [
+        threading.Thread(target=process_worker, args=[userdata], name=f"worker-{i}", daemon=True)
+        for i in range(userdata["workers"])
+    ]
+    for worker in workers:
+        worker.start()
 
     try:
         # Initialise client and callbacks
-        client = mqtt.Client(
-            client_id="test-sub",
+        client = InstrumentedClient(
+            client_id=userdata["client_id"],
             userdata=userdata,
             protocol=mqtt.MQTTv5,
-            transport=transport,
+            transport=paho_transport(userdata),
         )
         client.username_pw_set("test", "test")
         if userdata["tls"]:
-            client.tls_set()
+            client.tls_set_context(
+                ResumableSSLContext(userdata["tls_resume"], userdata["ca_certs"])
+            )
 
         client.on_connect = on_connect
         client.on_message = on_message
@@ -148,6 +463,12 @@ if __name__ == "__main__":
         # Initial connect
         properties = Properties(PacketTypes.CONNECT)
         properties.SessionExpiryInterval = 30
+        profiler = Profiler(userdata["profile_interval"]) if userdata["profile"] else None
+        if profiler:
+            profiler.start()
+        sampler = ResourceSampler(userdata["resource_interval"]) if userdata["resources"] else None
+        if sampler:
+            sampler.start(scheduler)
         connect_to_broker(client, userdata, properties)
 
         start_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
@@ -163,15 +484,28 @@ if __name__ == "__main__":
                 try:
                     client.reconnect()
                     connected = True
-                    userdata["e2e_data"][-1]["reconnect_time"] = get_time()
+                    userdata["last_disconnect"]["reconnect_time"] = get_time()
                 except socket.timeout:
                     pass
     except KeyboardInterrupt:
+        scheduler.stop()
+        # let the workers process what is left in the queue before calculating the stats
+        for _ in workers:
+            userdata["queue"].put(None)
+        for worker in workers:
+            worker.join()
         cur_date = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        if profiler:
+            profiler.stop()
+            profile_fnames = profiler.dump(get_data_fname("sub-profile", cur_date, userdata, ""))
+        if sampler:
+            sampler.stop()
+            resources_fname = dump_data("sub-resources", sampler.dump(), cur_date, userdata)
         if conn_data:
             conn_data_fname = dump_data("sub-conn", conn_data, cur_date, userdata)
             conn_delay_stats = calc_stats(conn_data)
             conn_tries_stats = calc_stats(conn_data, "tries")
+            conn_phase_stats = calc_conn_phase_stats(conn_data)
         if e2e_data:
             # Write collected data to file
             #   Can delete if we don't need to collect all the generated data
@@ -181,59 +515,112 @@ if __name__ == "__main__":
             # Process collected data
             print("Calculating statistics...")
             e2e_stats = calc_stats(e2e_data)
+            seq_stats = {
+                stream: tracker.summary(userdata["total_packets"], userdata["expected_seq_nums"])
+                for stream, tracker in userdata["seq_trackers"].items()
+            }
+            expected = userdata["expected_seq_nums"]
+            pkt_expected = len(expected) if expected is not None else userdata["total_packets"]
+            lost = sum(stream["lost"] for stream in seq_stats.values())
+            # samples dropped from the worker queue were received from the broker, but never processed
+            dropped = userdata["samples_dropped"]
 
-            stats_folder = "summary/"
-            stats_fname = (
-                stats_folder
-                + "_qos"
-                + str(userdata["qos"])
-                + "_"
-                + userdata["label"]
-                + ("_tls" if userdata["tls"] else "")
-                + ".json"
-            )
+            summary_data = {
+                "start_time": start_time,
+                "label": userdata["label"],
+                "client_id": userdata["client_id"],
+                "e2e_data_file": data_fname,
+                "tls": userdata["tls"],
+                "transport": userdata["transport"],
+                "qos": userdata["qos"],
+                "pkt_sent": userdata["total_packets"],
+                "topic_count": len(userdata["topics"]),
+                "sub_count": len(userdata["topic_filters"]),
+                "pkt_recv": e2e_stats["count"],
+                "pkt_expected": pkt_expected,
+                "pkt_loss": (lost + dropped) / (pkt_expected * max(len(seq_stats), 1))
+                if pkt_expected
+                else 0,
+                "pkt_dropped": dropped,
+                "pkt_dup": sum(stream["duplicates"] for stream in seq_stats.values())
+                + userdata["assembler"].duplicates,
+                "pkt_reordered": sum(stream["out_of_order"] for stream in seq_stats.values()),
+                "seq_stats": seq_stats,
+                "wire": calc_wire_stats(
+                    client.byte_totals(),
+                    userdata["transport"],
+                    sum(stream["unique"] for stream in seq_stats.values()) - dropped,
+                ),
+                "throughput": calc_throughput(
+                    e2e_stats["count"],
+                    min(pkt["send_time"] for pkt in e2e_data if pkt["seq_num"] != -1),
+                    max(pkt["rcv_time"] for pkt in e2e_data if pkt["seq_num"] != -1),
+                ),
+                "e2e_delay": e2e_stats,
+            }
+            if conn_data:
+                summary_data["conn_delay"] = conn_delay_stats
+                summary_data["conn_tries"] = conn_tries_stats
+                summary_data["conn_phases"] = conn_phase_stats
+                summary_data["conn_data_file"] = conn_data_fname
+            if profiler:
+                summary_data["profile"] = profiler.summary(profile_fnames)
+            summary_data["scheduler"] = scheduler.summary()
+            if sampler:
+                summary_data["resources"] = sampler.summary(resources_fname)
+            if userdata["workers"]:
+                summary_data["worker_queue"] = calc_queue_stats(userdata, e2e_data)
+            else:
+                summary_data["process_time"] = calc_stats(
+                    [pkt for pkt in e2e_data if "process_time" in pkt], "process_time"
+                )
+            if userdata["blob"]:
+                blobs = [blob for blob in e2e_data if blob["seq_num"] != -1]
+                summary_data["blob_corrupt"] = userdata["blob_corrupt"]
+                summary_data["blob_incomplete"] = len(userdata["assembler"].pending)
+                summary_data["blob_dup_chunks"] = userdata["assembler"].duplicates
+                summary_data["goodput_MBps"] = goodput(
+                    sum(blob["size"] for blob in blobs),
+                    min(blob["send_time"] for blob in blobs),
+                    max(blob["rcv_time"] for blob in blobs),
+                )
 
-            if not os.path.isdir(stats_folder):
-                os.mkdir(stats_folder)
-
-            with open(stats_fname, "r+") as stats_f:
-                cur_data = json.load(stats_f)
-                summary_data = {
-                    "start_time": start_time,
-                    "label": userdata["label"],
-                    "e2e_data_file": data_fname,
-                    "tls": userdata["tls"],
-                    "qos": userdata["qos"],
-                    "pkt_sent": userdata["total_packets"],
-                    "pkt_recv": e2e_stats["count"],
-                    "pkt_loss": (userdata["total_packets"] - e2e_stats["count"])
-                    / userdata["total_packets"],
-                    "e2e_delay": e2e_stats,
-                }
-                if conn_data:
-                    summary_data["conn_delay"] = conn_delay_stats
-                    summary_data["conn_tries"] = conn_tries_stats
-                    summary_data["conn_data_file"] = conn_data_fname
-
-                stats_f.seek(0)
-                json.dump({**cur_data, "subscriber": summary_data}, stats_f)
-
-            os.rename(
-                stats_fname,
-                stats_folder
-                + cur_date
-                + "_qos"
-                + str(userdata["qos"])
-                + "_"
-                + userdata["label"]
-                + ("_tls" if userdata["tls"] else "")
-                + ".json",
-            )
+            if userdata["share_group"]:
+                # members of a consumer group only write their own summary,
+                # group-summary.py merges them with the publisher's once all members have stopped
+                summary_data["share_group"] = userdata["share_group"]
+                dump_member_summary(summary_data, userdata)
+            else:
+                stats_folder = "summary/"
+                stats_fname = (
+                    stats_folder
+                    + "_qos"
+                    + str(userdata["qos"])
+                    + "_"
+                    + userdata["label"]
+                    + ("_tls" if userdata["tls"] else "")
+                    + ".json"
+                )
+
+                if not os.path.isdir(stats_folder):
+                    os.mkdir(stats_folder)
+
+                with open(stats_fname, "r+") as stats_f:
+                    cur_data = json.load(stats_f)
+                    stats_f.seek(0)
+                    json.dump({**cur_data, "subscriber": summary_data}, stats_f)
 
-        # Stop disconnect thread, blocks until disconnect thread has been stopped
-        if userdata["disconnect_thread"] is not None:
-            print("Cancelling timer...")
-            userdata["disconnect_event"].set()
-            userdata["disconnect_thread"].join()
+                os.rename(
+                    stats_fname,
+                    stats_folder
+                    + cur_date
+                    + "_qos"
+                    + str(userdata["qos"])
+                    + "_"
+                    + userdata["label"]
+                    + ("_tls" if userdata["tls"] else "")
+                    + ".json",
+                )
 
+        userdata["metrics"].stop()
         print("Subscriber closed successfully")
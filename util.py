@@ -4,16 +4,21 @@ import statistics
 import time
 import yaml
 import socket
+import itertools
+import bisect
 import paho.mqtt.client as mqtt
 
 
+# defaults, can be overridden per client with hostname, port and transport in the input file
 hostname = "m.shohamc1.com"
-port = 80
-transport = "websockets"
+transport = "ws"
 # hostname = "ec2-3-137-165-98.us-east-2.compute.amazonaws.com"
-# port = 1883
 # transport = "tcp"
+# port used for each transport if port is not set
+transport_ports = {"tcp": 1883, "ws": 80, "tls": 8883, "wss": 443}
 keepalive = 60
+# latency histogram bucket upper bounds in ms
+latency_buckets = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000]
 
 
 def parse_yaml(fname, userdata, caller):
@@ -23,19 +28,34 @@ def parse_yaml(fname, userdata, caller):
         else:
             with open(fname, "r") as input_f:
                 input_values = yaml.safe_load(input_f)
-                if input_values.get(caller, None) is not None:
-                    userdata = {**userdata, **input_values[caller]}
+                # values in the client's own section override the shared ones
                 if input_values.get("shared", None) is not None:
                     userdata = {**userdata, **input_values["shared"]}
-    global port
+                if input_values.get(caller, None) is not None:
+                    userdata = {**userdata, **input_values[caller]}
+    # tls: True upgrades the transport for backwards compatibility with older input files
     if userdata["tls"]:
-        port = 443
+        userdata["transport"] = {"tcp": "tls", "ws": "wss"}.get(
+            userdata["transport"], userdata["transport"]
+        )
+    if userdata["transport"] not in transport_ports:
+        raise ValueError(f"Unknown transport {userdata['transport']}")
+    userdata["tls"] = userdata["transport"] in ("tls", "wss")
+    if not userdata["port"]:
+        userdata["port"] = transport_ports[userdata["transport"]]
     return userdata
 
 
-def dump_data(subfolder, data_dump, cur_date, userdata):
+def paho_transport(userdata):
+    """paho only distinguishes tcp and websockets, TLS is enabled separately"""
+    return "websockets" if userdata["transport"] in ("ws", "wss") else "tcp"
+
+
+def get_data_fname(subfolder, cur_date, userdata, ext=".json"):
     data_folder = f"data/{subfolder}/"
-    data_fname = (
+    if not os.path.isdir(data_folder):
+        os.makedirs(data_folder)
+    return (
         data_folder
         + cur_date
         + "_qos"
@@ -43,10 +63,14 @@ def dump_data(subfolder, data_dump, cur_date, userdata):
         + "_"
         + userdata["label"]
         + ("_tls" if userdata["tls"] else "")
-        + ".json"
+        # members of a consumer group share a label
+        + (f"_{userdata['client_id']}" if userdata.get("share_group", "") else "")
+        + ext
     )
-    if not os.path.isdir(data_folder):
-        os.makedirs(data_folder)
+
+
+def dump_data(subfolder, data_dump, cur_date, userdata):
+    data_fname = get_data_fname(subfolder, cur_date, userdata)
     with open(data_fname, "w") as data_f:
         json.dump(data_dump, data_f)
     return data_fname
@@ -79,6 +103,42 @@ def calc_stats(dataset, parameter="time_diff"):
     }
 
 
+def calc_histogram(dataset, parameter="time_diff", buckets=None):
+    """Counts dataset[parameter] into buckets given by their upper bounds (ms).
+    The last count is for values above the last bound."""
+    buckets = buckets or latency_buckets
+    counts = [0] * (len(buckets) + 1)
+    for pkt in dataset:
+        if pkt.get(parameter, None) is not None:
+            counts[bisect.bisect_left(buckets, pkt[parameter])] += 1
+    return {"buckets": buckets, "counts": counts}
+
+
+def calc_conn_phase_stats(conn_data):
+    """Stats of the connect phases recorded by record_connect(), with full and resumed
+    TLS handshakes kept apart"""
+    phase_stats = {}
+    for phase in ["tcp_time", "tls_time", "ws_time", "mqtt_time"]:
+        phase_data = [conn for conn in conn_data if phase in conn]
+        if phase_data:
+            phase_stats[phase] = calc_stats(phase_data, phase)
+    for name, resumed in [("tls_full_time", False), ("tls_resumed_time", True)]:
+        phase_data = [
+            conn for conn in conn_data if conn.get("tls_resumed", None) is resumed
+        ]
+        if phase_data:
+            phase_stats[name] = calc_stats(phase_data, "tls_time")
+    return phase_stats
+
+
+def calc_throughput(count, start_time, end_time):
+    """Returns messages per second given start and end times in ms"""
+    duration = end_time - start_time
+    if duration <= 0:
+        return 0
+    return count * 1000 / duration
+
+
 def get_time():
     return time.time_ns() // (10 ** 3) / (10 ** 3)
 
@@ -90,8 +150,8 @@ def connect_to_broker(client, userdata, properties=None):
         userdata["conn_tries"] += 1
         try:
             client.connect(
-                hostname,
-                port,
+                userdata["hostname"],
+                userdata["port"],
                 keepalive,
                 clean_start=False,
                 properties=properties,
@@ -101,7 +161,12 @@ def connect_to_broker(client, userdata, properties=None):
             print("connection error, retrying...")
 
 
-def record_connect(userdata):
+def record_connect(userdata, phases=None):
+    """Records the connect delay of a connection attempt started by connect_to_broker() or a manual reconnect.
+    phases optionally holds the per-phase durations of the attempt (see calc_connect_durations())."""
+    userdata["metrics"].inc("connects")
+    if userdata["metrics"].get("connects") > 1:
+        userdata["metrics"].inc("reconnects")
     if userdata["conn_time"] != -1 and userdata["conn_tries"] > 0:
         connected_time = get_time()
         userdata["conn_data"].append(
@@ -110,7 +175,84 @@ def record_connect(userdata):
                 "connected_time": connected_time,
                 "time_diff": connected_time - userdata["conn_time"],
                 "tries": userdata["conn_tries"],
+                **(phases or {}),
             }
         )
         userdata["conn_time"] = -1
         userdata["conn_tries"] = 0
+
+
+def generate_topics(root="test", depth=0, fanout=1):
+    """Returns all leaf topics of a tree with the given depth and fan-out under root,
+    eg. depth 2 and fanout 3 gives test/0/0, test/0/1, ..., test/2/2"""
+    return [
+        "/".join([root, *map(str, levels)])
+        for levels in itertools.product(range(fanout), repeat=depth)
+    ]
+
+
+def generate_filters(topics, root="test", exact=0, plus=0, multi=0):
+    """Returns a mix of exact, single-level (+) and multi-level (#) filters over topics.
+    No two filters match the same topic, as the broker may send a copy of a message for every
+    subscription that matches it. Wildcard filters are picked first since they need a whole part
+    of the tree to be free, and take turns over the levels below root so that they differ in
+    which part of the tree they select. Fewer filters are returned once the tree is used up."""
+    depth = topics[0].count("/")
+    topic_levels = [topic.split("/") for topic in topics]
+    # one list of candidates per level, subtrees are taken from the end of the tree
+    multi_filters = [
+        dict.fromkeys("/".join(levels[: 1 + i] + ["#"]) for levels in reversed(topic_levels))
+        for i in range(1, depth + 1)
+    ]
+    plus_filters = [
+        dict.fromkeys("/".join(levels[:i] + ["+"] + levels[i + 1 :]) for levels in topic_levels)
+        for i in range(1, depth + 1)
+    ]
+    step = max(1, len(topics) // exact) if exact else 1
+    exact_filters = [dict.fromkeys(topics[::step] + topics)]
+
+    leaves = list(zip(topics, topic_levels))
+    covered = set()
+    filters = []
+    for candidates, count in [(multi_filters, multi), (plus_filters, plus), (exact_filters, exact)]:
+        # a candidate that overlaps once always will, so each level is only scanned once
+        levels = [iter(level) for level in candidates]
+        for i in range(count if levels else 0):
+            for level in levels[i % len(levels) :] + levels[: i % len(levels)]:
+                topic_filter = next_disjoint(level, leaves, covered)
+                if topic_filter is not None:
+                    filters.append(topic_filter)
+                    break
+
+    if not filters:
+        filters = [f"{root}/#"] if depth > 0 else [root]
+    return filters
+
+
+def subscribed_seq_nums(topics, filters, total_packets):
+    """Returns the seq nums of the messages that the publisher sends to topics matched by filters,
+    or None if the filters match every topic. Message seq_num goes to topics[(seq_num - 1) % len(topics)]."""
+    matched = [any(mqtt.topic_matches_sub(f, topic) for f in filters) for topic in topics]
+    if all(matched):
+        return None
+    return [seq_num for seq_num in range(1, total_packets + 1) if matched[(seq_num - 1) % len(topics)]]
+
+
+def next_disjoint(candidates, topics, covered):
+    """Returns the next filter from candidates that matches none of the covered topics
+    and adds the topics it matches to covered, or None if there is none left.
+    topics are (topic, levels) pairs of a tree whose leaves all have the same depth."""
+    for topic_filter in candidates:
+        filter_levels = topic_filter.split("/")
+        if "+" in filter_levels or "#" in filter_levels:
+            matched = {
+                topic
+                for topic, levels in topics
+                if all(f in ("+", "#", level) for f, level in zip(filter_levels, levels))
+            }
+        else:
+            matched = {topic_filter}
+        if not matched & covered:
+            covered |= matched
+            return topic_filter
+    return None